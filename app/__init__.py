@@ -14,6 +14,10 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-development')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///calendar_app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DURATION_MODEL_DIR'] = os.environ.get(
+        'DURATION_MODEL_DIR', os.path.join(app.instance_path, 'duration_models')
+    )
+    app.config['PRELOAD_ML'] = os.environ.get('PRELOAD_ML', '0') == '1'
     
     # Initialize extensions with app
     db.init_app(app)
@@ -39,6 +43,22 @@ def create_app():
     app.register_blueprint(schedule, url_prefix='/schedule')
     app.register_blueprint(tasks, url_prefix='/tasks')
     
+    # Set up background jobs and the free/busy cache
+    from app.jobs import init_jobs, init_model_retrainer
+    from app.models.schedule_cache import init_schedule_cache
+    init_jobs(app)
+    init_model_retrainer(app)
+    init_schedule_cache(app)
+    
+    # Import the ML stack in the background rather than on the first estimate
+    if app.config['PRELOAD_ML']:
+        from app.models.duration_estimator import preload_ml_stack
+        preload_ml_stack()
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Create database tables
     with app.app_context():
         db.create_all()
@@ -0,0 +1,165 @@
+import datetime
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+
+def register_commands(app):
+    """Register the app's Flask CLI commands."""
+    app.cli.add_command(schedule_all_command)
+    app.cli.add_command(train_duration_model_command)
+
+@click.command('schedule-all')
+@click.option('--workers', type=int, default=os.cpu_count(), show_default=True,
+              help='Worker processes to shard users across (0 runs in-process).')
+@click.option('--shard-size', type=int, default=50, show_default=True,
+              help='Users per shard; each shard is loaded and written in one batch.')
+@click.option('--days', type=int, default=7, show_default=True,
+              help='Length of the scheduling window, starting today.')
+@with_appcontext
+def schedule_all_command(workers, shard_size, days):
+    """Re-plan every user's schedule in parallel."""
+    from app.models.models import User
+    
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+    start_date = datetime.date.today()
+    end_date = start_date + datetime.timedelta(days=days)
+    
+    started = time.perf_counter()
+    latencies = []
+    block_count = 0
+    
+    if workers == 0:
+        for shard in shards:
+            shard_blocks, shard_latencies = schedule_users(shard, start_date, end_date)
+            block_count += shard_blocks
+            latencies.extend(shard_latencies)
+    else:
+        database_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(database_uri,)) as executor:
+            futures = [executor.submit(_schedule_shard, shard, start_date, end_date) for shard in shards]
+            for future in as_completed(futures):
+                shard_blocks, shard_latencies = future.result()
+                block_count += shard_blocks
+                latencies.extend(shard_latencies)
+    
+    elapsed = time.perf_counter() - started
+    throughput = len(user_ids) / elapsed if elapsed > 0 else 0.0
+    click.echo(f'Scheduled {block_count} blocks for {len(user_ids)} users '
+               f'in {elapsed:.2f}s ({throughput:.1f} users/s)')
+    if latencies:
+        latencies.sort()
+        click.echo('Per-user latency: ' + ', '.join(
+            f'p{pct}={_percentile(latencies, pct) * 1000:.1f}ms' for pct in (50, 90, 99)
+        ) + f', max={latencies[-1] * 1000:.1f}ms')
+
+def schedule_users(user_ids, start_date, end_date):
+    """
+    Re-plan a batch of users' schedules inside the current app context.
+    
+    The users' preferences, fixed items, open tasks, task dependencies and
+    the prerequisites outside their open tasks are loaded with one query
+    each, every user is planned independently, and the results are
+    written in a single transaction.
+    
+    Args:
+        user_ids: IDs of the users to schedule
+        start_date: Start date for scheduling
+        end_date: End date for scheduling
+    
+    Returns:
+        Tuple of (number of blocks written, list of per-user planning seconds)
+    """
+    from app.models.models import UserPreferences, FixedScheduleItem, Task, TaskDependency
+    from app.models.scheduler import IntelligentScheduler, load_prerequisite_ends, save_plans
+    
+    preferences = {
+        prefs.user_id: prefs
+        for prefs in UserPreferences.query.filter(UserPreferences.user_id.in_(user_ids))
+    }
+    fixed_items = defaultdict(list)
+    for item in FixedScheduleItem.query.filter(FixedScheduleItem.user_id.in_(user_ids)):
+        fixed_items[item.user_id].append(item)
+    open_tasks = defaultdict(list)
+    # Scheduled tasks lose their blocks below, so they are planned again too
+    for task in Task.query.filter(Task.user_id.in_(user_ids), Task.status.in_(('pending', 'scheduled'))):
+        open_tasks[task.user_id].append(task)
+    dependencies = defaultdict(list)
+    rows = db.session.query(Task.user_id, TaskDependency.task_id, TaskDependency.dependent_task_id).join(
+        Task, Task.id == TaskDependency.dependent_task_id
+    ).filter(Task.user_id.in_(user_ids))
+    for user_id, prerequisite_id, dependent_id in rows:
+        dependencies[user_id].append((prerequisite_id, dependent_id))
+    # Prerequisites that aren't planned, such as tasks in progress, as plan() would look them up
+    outside_prerequisites = {}
+    for user_id in user_ids:
+        planned_ids = {task.id for task in open_tasks[user_id]}
+        outside_prerequisites[user_id] = {
+            prerequisite_id for prerequisite_id, dependent_id in dependencies[user_id]
+            if dependent_id in planned_ids and prerequisite_id not in planned_ids
+        }
+    prerequisite_ends = load_prerequisite_ends(set().union(*outside_prerequisites.values()))
+    
+    plans = {}
+    latencies = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        scheduler = IntelligentScheduler(
+            user_id, start_date, end_date,
+            preferences=preferences.get(user_id),
+            fixed_items=fixed_items[user_id],
+            dependencies=dependencies[user_id]
+        )
+        plans[user_id] = scheduler.plan(open_tasks[user_id], prerequisite_ends={
+            task_id: prerequisite_ends[task_id]
+            for task_id in outside_prerequisites[user_id] if task_id in prerequisite_ends
+        })
+        latencies.append(time.perf_counter() - started)
+    
+    # Replace the batch's plans in one transaction
+    save_plans(plans, replace_existing=True)
+    db.session.commit()
+    
+    return sum(len(placements) for placements in plans.values()), latencies
+
+@click.command('train-duration-model')
+@with_appcontext
+def train_duration_model_command():
+    """Train the shared duration model and refit every user's adjustment."""
+    from app.models.duration_estimator import TaskDurationEstimator, update_duration_adjustment
+    from app.models.models import Task
+    
+    if not TaskDurationEstimator().update_global_model():
+        click.echo('Not enough feedback to train a model; estimates stay rule-based')
+    user_ids = [user_id for (user_id,) in
+                db.session.query(Task.user_id).filter(Task.actual_duration.isnot(None)).distinct()]
+    for user_id in user_ids:
+        update_duration_adjustment(user_id)
+    click.echo(f'Fitted duration adjustments for {len(user_ids)} users')
+
+# Flask app of the current worker process
+_worker_app = None
+
+def _init_worker(database_uri):
+    """Create a Flask app bound to the parent's database in a worker process."""
+    global _worker_app
+    from app import create_app
+    
+    os.environ['DATABASE_URL'] = database_uri
+    _worker_app = create_app()
+
+def _schedule_shard(user_ids, start_date, end_date):
+    """Run schedule_users for one shard inside the worker's app context."""
+    with _worker_app.app_context():
+        return schedule_users(user_ids, start_date, end_date)
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
@@ -0,0 +1,316 @@
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from flask import current_app
+
+def init_jobs(app):
+    """Attach a schedule generation job queue to the app."""
+    app.extensions['schedule_jobs'] = ScheduleJobQueue(app, app.config.get('SCHEDULE_JOB_WORKERS', 2))
+
+def get_job_queue():
+    """The current app's schedule generation job queue."""
+    return current_app.extensions['schedule_jobs']
+
+class ScheduleJob:
+    """A schedule generation run for one user."""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    
+    def __init__(self, user_id):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = self.QUEUED
+        self.scheduled_count = None
+        self.error = None
+        self.created_at = datetime.datetime.now()
+        self.finished_at = None
+        # Set when the user's data changed while the job was already running
+        self.rerun = False
+        self.done = threading.Event()
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'scheduled_count': self.scheduled_count,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ScheduleJobQueue:
+    """
+    In-process worker pool that generates schedules in the background.
+    
+    Each user has at most one active job. Submitting while a job is queued
+    returns that job; submitting while it is running returns it too, and
+    makes it run once more when done so the latest edits are picked up.
+    Incremental repairs after an edit go through repair, which shares a
+    per-user lock with the jobs, so a user's scheduled blocks are only
+    ever rewritten by one thread at a time.
+    """
+    
+    # Finished jobs are kept this long for status polling
+    RETENTION = datetime.timedelta(hours=1)
+    
+    def __init__(self, app, max_workers=2):
+        """
+        Args:
+            app: Flask app whose context the jobs run in
+            max_workers: Number of worker threads
+        """
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='schedule-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._user_locks = {}
+    
+    def submit(self, user_id):
+        """
+        Queue a schedule generation for a user, or join the one already active.
+        
+        Returns:
+            ScheduleJob
+        """
+        with self._lock:
+            self._prune()
+            job = self._active.get(user_id)
+            if job is not None:
+                if job.status == ScheduleJob.RUNNING:
+                    job.rerun = True
+                return job
+            
+            job = ScheduleJob(user_id)
+            self._jobs[job.id] = job
+            self._active[user_id] = job
+        self._executor.submit(self._run, job)
+        return job
+    
+    def user_lock(self, user_id):
+        """Lock held while a user's scheduled blocks are being rewritten."""
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+    
+    def repair(self, user_id, change):
+        """
+        Repair a user's plan after an edit, in the calling thread.
+        
+        Waits for a running job of the user to finish first, and holds any
+        job that starts meanwhile back until the repair is done.
+        
+        Args:
+            user_id: User whose plan to repair
+            change: ScheduleChange describing what was edited
+        
+        Returns:
+            List of Placement objects for the newly scheduled blocks
+        """
+        from app.models.scheduler import reschedule_for_user
+        
+        with self.user_lock(user_id):
+            return reschedule_for_user(user_id, change)
+    
+    def get(self, job_id):
+        """Look up a job by ID; returns None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def wait(self, job_id, timeout=None):
+        """
+        Block until a job is finished or failed.
+        
+        Returns:
+            The ScheduleJob, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+    
+    def _run(self, job):
+        from app.models.scheduler import replace_schedule_for_user
+        
+        while True:
+            with self._lock:
+                job.status = ScheduleJob.RUNNING
+                job.rerun = False
+            try:
+                with self.user_lock(job.user_id), self.app.app_context():
+                    placements = replace_schedule_for_user(job.user_id)
+                job.scheduled_count = len(placements)
+                status, error = ScheduleJob.FINISHED, None
+            except Exception as e:
+                self.app.logger.exception('Schedule generation failed for user %s', job.user_id)
+                status, error = ScheduleJob.FAILED, str(e)
+            
+            with self._lock:
+                if job.rerun:
+                    continue
+                job.status = status
+                job.error = error
+                job.finished_at = datetime.datetime.now()
+                del self._active[job.user_id]
+            job.done.set()
+            return
+    
+    def _prune(self):
+        """Forget finished jobs past the retention period."""
+        cutoff = datetime.datetime.now() - self.RETENTION
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+def init_model_retrainer(app):
+    """Attach a duration model retrainer to the app."""
+    app.extensions['model_retrainer'] = ModelRetrainer(
+        app, app.config.get('MODEL_RETRAIN_DELAY', 5.0),
+        online=app.config.get('DURATION_MODEL_MODE', 'batch') == 'online'
+    )
+
+def get_model_retrainer():
+    """The current app's duration model retrainer."""
+    return current_app.extensions['model_retrainer']
+
+class ModelRetrainer:
+    """
+    Retrains the duration model and users' adjustments in the background.
+    
+    Feedback only records a request; the work starts once feedback has
+    been quiet for the debounce delay, so a burst of feedback costs one
+    retrain. Each piece of work is keyed: GLOBAL for the model shared by
+    all users, a user ID for that user's adjustment, STALE for refitting
+    every adjustment fitted against an older model. At most one run per
+    key happens at a time; feedback that arrives meanwhile schedules
+    another one afterwards. The retrained model is written to a temporary
+    file and swapped in, then put in the estimator cache, so requests
+    switch from the old model to the new one in one step. Adjustments
+    fitted against the old model are then refitted for every user, not
+    only the one who gave feedback, in one batched run.
+    
+    In online mode only the feedback received since the last update is
+    learned, incrementally, instead of refitting on the whole history.
+    """
+    
+    # Key of the shared model's retrains
+    GLOBAL = 'global'
+    
+    # Key of the batched refit of adjustments the shared model outdated
+    STALE = 'stale'
+    
+    def __init__(self, app, delay=5.0, max_workers=1, online=False):
+        """
+        Args:
+            app: Flask app whose context the retrains run in
+            delay: Seconds without new feedback before a retrain starts
+            max_workers: Number of retrains that may run at once
+            online: Update an incremental model with new feedback only
+        """
+        self.app = app
+        self.delay = delay
+        self.online = online
+        self._observations = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-retrain')
+        self._lock = threading.Condition()
+        self._timers = {}
+        self._running = set()
+        self._dirty = set()
+    
+    def request_retrain(self, user_id, task=None):
+        """
+        Schedule a retrain of the shared model and the user's adjustment,
+        postponing any that hasn't started.
+        
+        Args:
+            user_id: User who gave feedback
+            task: Task whose actual duration was just recorded, if any
+        """
+        with self._lock:
+            if self.online and task is not None:
+                self._observations.append(SimpleNamespace(
+                    title=task.title,
+                    description=task.description,
+                    category=task.category,
+                    actual_duration=task.actual_duration
+                ))
+            # Scheduled first so that, with one worker, the adjustment is
+            # fitted against the updated model
+            self._schedule(self.GLOBAL)
+            self._schedule(user_id)
+    
+    def wait_idle(self, timeout=None):
+        """
+        Block until no retrain is scheduled or running.
+        
+        Returns:
+            True if idle, False if the timeout expired first
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._timers and not self._running, timeout)
+    
+    def _schedule(self, key):
+        # Called with the lock held
+        if key in self._running:
+            self._dirty.add(key)
+            return
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(self.delay, self._start, args=(key,))
+        timer.daemon = True
+        self._timers[key] = timer
+        timer.start()
+    
+    def _start(self, key):
+        with self._lock:
+            if self._timers.get(key) is not threading.current_thread():
+                # Replaced by a later request
+                return
+            del self._timers[key]
+            self._running.add(key)
+        self._executor.submit(self._retrain, key)
+    
+    def _retrain(self, key):
+        from app.models.duration_estimator import (
+            TaskDurationEstimator, _global_model_path, stale_duration_adjustments, update_duration_adjustment
+        )
+        
+        with self._lock:
+            observations = []
+            if key == self.GLOBAL:
+                observations, self._observations = self._observations, []
+        model_changed = False
+        try:
+            with self.app.app_context():
+                if key == self.STALE:
+                    for user_id in stale_duration_adjustments():
+                        update_duration_adjustment(user_id)
+                elif key != self.GLOBAL:
+                    update_duration_adjustment(key)
+                elif self.online:
+                    if not observations:
+                        # Saving an unchanged model would still invalidate every cached estimate
+                        return
+                    # Continue from a private copy of the current model
+                    estimator = TaskDurationEstimator(model_path=_global_model_path())
+                    model_changed = estimator.update_global_model(new_tasks=observations)
+                else:
+                    model_changed = TaskDurationEstimator().update_global_model()
+        except Exception:
+            self.app.logger.exception('Retraining the duration model failed for %s', key)
+        finally:
+            with self._lock:
+                self._running.discard(key)
+                rerun = key in self._dirty
+                self._dirty.discard(key)
+                if rerun:
+                    self._schedule(key)
+                if model_changed:
+                    self._schedule(self.STALE)
+                self._lock.notify_all()
@@ -0,0 +1,95 @@
+import numpy as np
+from app.models.scheduling_core import (
+    MINUTES_PER_DAY, FreeBlock, date_to_epoch_minutes, time_to_minutes
+)
+
+class AvailabilityBitmap:
+    """
+    Free/busy map of a scheduling window as a boolean array.
+    
+    Each day is a row of slots at a fixed minute resolution; a slot is True
+    when it lies inside the user's daily time window and nothing occupies
+    it. Painting fixed occurrences or placements, checking whether a task
+    fits somewhere and finding free runs are all vectorized array
+    operations, so overlapping items need no interval bookkeeping.
+    """
+    
+    def __init__(self, window, preferences, resolution=1):
+        """
+        Args:
+            window: SchedulingWindow covered by the bitmap
+            preferences: SchedulingPreferences with the daily time window
+            resolution: Minutes per slot; must divide a day evenly
+        """
+        if MINUTES_PER_DAY % resolution:
+            raise ValueError(f'Resolution must divide {MINUTES_PER_DAY} minutes, got {resolution}')
+        
+        self.resolution = resolution
+        self.origin = date_to_epoch_minutes(window.start_date)
+        days = (window.end_date - window.start_date).days + 1
+        slots_per_day = MINUTES_PER_DAY // resolution
+        
+        # Open the daily window, rounding inwards to whole slots
+        first_slot = -(-time_to_minutes(preferences.start_day_time) // resolution)
+        last_slot = time_to_minutes(preferences.end_day_time) // resolution
+        self.slots = np.zeros((days, slots_per_day), dtype=bool)
+        self.slots[:, first_slot:last_slot] = True
+        self._flat = self.slots.reshape(-1)
+    
+    def _slot_range(self, start, end):
+        """Slots touched by [start, end) epoch minutes, clipped to the window."""
+        first = max(0, (start - self.origin) // self.resolution)
+        last = min(len(self._flat), -(-(end - self.origin) // self.resolution))
+        return first, max(first, last)
+    
+    def paint_busy(self, intervals):
+        """
+        Mark (start, end) epoch-minute intervals as busy.
+        
+        Intervals may overlap; they are painted together with a difference
+        array and a cumulative sum rather than one slice at a time.
+        """
+        intervals = np.asarray(list(intervals), dtype=np.int64).reshape(-1, 2)
+        if not len(intervals):
+            return
+        size = len(self._flat)
+        starts = np.clip((intervals[:, 0] - self.origin) // self.resolution, 0, size)
+        ends = np.clip(-(-(intervals[:, 1] - self.origin) // self.resolution), 0, size)
+        keep = ends > starts
+        
+        coverage = np.zeros(size + 1, dtype=np.int64)
+        np.add.at(coverage, starts[keep], 1)
+        np.add.at(coverage, ends[keep], -1)
+        self._flat &= np.cumsum(coverage[:-1]) == 0
+    
+    def occupy(self, start, end):
+        """Mark a single [start, end) epoch-minute interval, such as a placement, as busy."""
+        first, last = self._slot_range(start, end)
+        self._flat[first:last] = False
+    
+    def fits(self, start, duration):
+        """Check whether [start, start + duration) is entirely free."""
+        end = start + duration
+        first, last = self._slot_range(start, end)
+        # Compare with the unclipped span; a difference means part of the
+        # interval lies outside the bitmap
+        if (first != (start - self.origin) // self.resolution
+                or last != -(-(end - self.origin) // self.resolution)):
+            return False
+        return bool(self._flat[first:last].all())
+    
+    def free_blocks(self, min_block_duration):
+        """
+        Find free runs of at least min_block_duration minutes.
+        
+        Returns:
+            Chronological list of FreeBlock objects
+        """
+        edges = np.diff(np.concatenate(([0], self._flat.view(np.int8), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        long_enough = (run_ends - run_starts) * self.resolution >= min_block_duration
+        
+        starts = run_starts[long_enough] * self.resolution + self.origin
+        ends = run_ends[long_enough] * self.resolution + self.origin
+        return [FreeBlock(start, end) for start, end in zip(starts.tolist(), ends.tolist())]
@@ -1,17 +1,225 @@
+import copy
+import hashlib
 import os
 import sys
-from app.models.models import Task, User
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import or_
+from app.models.models import Task, User, DurationAdjustment
 from app import db
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LinearRegression
-import pickle
 import re
 
+# scikit-learn and SciPy take most of a second to import, so they are
+# imported where a learned model is built or used rather than here; rule
+# based estimates never load them (see preload_ml_stack)
+
+# Tasks with feedback needed before a learned model is trusted
+MIN_TRAINING_TASKS = 5
+
+# Version of the array layout save_model writes
+MODEL_FORMAT_VERSION = 1
+
+# Bump when feature extraction or the rules change, so estimates cached
+# (and ETags handed out) by older code are not reused
+ESTIMATOR_VERSION = 1
+
+# Pseudo-observations pulling a user's adjustment towards no correction
+ADJUSTMENT_PRIOR_WEIGHT = 5
+
+# Range a user's adjustment may scale estimates by
+MIN_ADJUSTMENT_SCALE = 0.25
+MAX_ADJUSTMENT_SCALE = 4.0
+
+# Duration multipliers by category and by keywords in the task text; where
+# several appear, the first one listed wins
+CATEGORY_MULTIPLIERS = {
+    'work': 1.2,
+    'study': 1.1,
+    'research': 1.3,
+    'writing': 1.2,
+    'reading': 0.9,
+    'email': 0.7,
+    'meeting': 1.0,
+    'call': 0.8,
+    'exercise': 0.8,
+    'personal': 0.9,
+    'shopping': 0.8,
+    'cleaning': 0.9,
+    'cooking': 0.8,
+    'travel': 1.1,
+    'project': 1.3,
+    'assignment': 1.2,
+    'exam': 1.2,
+    'presentation': 1.1,
+    'report': 1.2,
+    'planning': 0.9,
+    'design': 1.2,
+    'development': 1.3,
+    'testing': 1.0,
+    'debugging': 1.2,
+    'review': 0.9,
+    'analysis': 1.1
+}
+
+KEYWORD_MULTIPLIERS = {
+    'quick': 0.5,
+    'brief': 0.5,
+    'short': 0.7,
+    'small': 0.7,
+    'simple': 0.7,
+    'easy': 0.7,
+    'basic': 0.8,
+    'medium': 1.0,
+    'average': 1.0,
+    'standard': 1.0,
+    'normal': 1.0,
+    'complex': 1.3,
+    'complicated': 1.3,
+    'difficult': 1.3,
+    'hard': 1.3,
+    'challenging': 1.3,
+    'long': 1.5,
+    'big': 1.5,
+    'large': 1.5,
+    'extensive': 1.8,
+    'comprehensive': 1.8,
+    'thorough': 1.8,
+    'detailed': 1.5,
+    'in-depth': 1.7
+}
+
+# Matched as substrings of the text, in the order listed
+_CATEGORY_TABLE = tuple(CATEGORY_MULTIPLIERS.items())
+_KEYWORD_TABLE = tuple(KEYWORD_MULTIPLIERS.items())
+
+# Same words as \b\w+\b, without the boundary checks
+_WORD_PATTERN = re.compile(r'\w+')
+# Explicit durations like "30 minutes" or "2 hours"; the second group is
+# only set for hours
+_DURATION_PATTERN = re.compile(r'(\d+)\s*(?:min(?:ute)?s?|((?:hour|hr)s?))')
+_DURATION_UNITS = ('min', 'hour', 'hr')
+
+def _first_multiplier(table, text):
+    """Multiplier of the first entry of a table found in the text, or 1.0."""
+    for key, multiplier in table:
+        if key in text:
+            return multiplier
+    return 1.0
+
+@lru_cache(maxsize=1024)
+def _category_multiplier(category):
+    # Categories repeat a lot, so their lookups are memoized
+    return _first_multiplier(_CATEGORY_TABLE, category)
+
+def _append_columns(matrix, rows):
+    """
+    Append dense columns to a sparse matrix, keeping it sparse.
+    
+    Equivalent to sparse.hstack with CSR output, but builds the arrays
+    directly, which is several times faster for the few rows of a request.
+    
+    Args:
+        matrix: Sparse matrix
+        rows: One list of column values per row of the matrix
+    
+    Returns:
+        scipy.sparse.csr_matrix
+    """
+    from scipy import sparse
+    
+    matrix = sparse.csr_matrix(matrix)
+    rows = np.asarray(rows, dtype=float).reshape(matrix.shape[0], -1)
+    row_count, extra = rows.shape
+    row_lengths = np.diff(matrix.indptr) + extra
+    indptr = np.concatenate(([0], np.cumsum(row_lengths)))
+    
+    # The new columns go at the end of every row
+    appended = np.zeros(indptr[-1], dtype=bool)
+    for column in range(1, extra + 1):
+        appended[indptr[1:] - column] = True
+    data = np.empty(indptr[-1])
+    indices = np.empty(indptr[-1], dtype=matrix.indices.dtype)
+    data[~appended] = matrix.data
+    indices[~appended] = matrix.indices
+    data[appended] = rows.ravel()
+    indices[appended] = np.tile(np.arange(matrix.shape[1], matrix.shape[1] + extra), row_count)
+    return sparse.csr_matrix((data, indices, indptr), shape=(row_count, matrix.shape[1] + extra))
+
+class OnlineDurationRegressor:
+    """
+    Linear regression learned one observation at a time.
+    
+    Features are scaled with running statistics and the target is learned
+    in hours, which keeps stochastic gradient descent stable; predict()
+    returns minutes like LinearRegression does on the batch features.
+    Memory use depends only on the number of features, never on how many
+    observations have been seen.
+    """
+    
+    def __init__(self):
+        from sklearn.linear_model import SGDRegressor
+        from sklearn.preprocessing import StandardScaler
+        
+        self.scaler = StandardScaler(with_mean=False)
+        self.regressor = SGDRegressor(learning_rate='invscaling', eta0=0.01, random_state=0)
+        self.n_seen = 0
+    
+    def partial_fit(self, X, y):
+        self.scaler.partial_fit(X)
+        self.regressor.partial_fit(self.scaler.transform(X), np.asarray(y, dtype=float) / 60)
+        self.n_seen += len(y)
+        return self
+    
+    def predict(self, X):
+        return self.regressor.predict(self.scaler.transform(X)) * 60
+    
+    def to_arrays(self):
+        """The learned state as a dict of NumPy arrays."""
+        return {
+            'coef': self.regressor.coef_,
+            'intercept': self.regressor.intercept_,
+            't': np.array(self.regressor.t_),
+            'n_iter': np.array(self.regressor.n_iter_),
+            'n_seen': np.array(self.n_seen),
+            'scaler_mean': self.scaler.mean_,
+            'scaler_var': self.scaler.var_,
+            'scaler_scale': self.scaler.scale_,
+            'scaler_n_samples_seen': np.asarray(self.scaler.n_samples_seen_)
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a regressor saved with to_arrays, ready to predict or keep learning."""
+        model = cls()
+        n_features = len(arrays['coef'])
+        
+        model.scaler.n_features_in_ = n_features
+        model.scaler.n_samples_seen_ = arrays['scaler_n_samples_seen'][()]
+        model.scaler.mean_ = arrays['scaler_mean']
+        model.scaler.var_ = arrays['scaler_var']
+        model.scaler.scale_ = arrays['scaler_scale']
+        
+        model.regressor.n_features_in_ = n_features
+        model.regressor.coef_ = arrays['coef']
+        model.regressor.intercept_ = arrays['intercept']
+        model.regressor.t_ = float(arrays['t'])
+        model.regressor.n_iter_ = int(arrays['n_iter'])
+        model.n_seen = int(arrays['n_seen'])
+        return model
+
 class TaskDurationEstimator:
     """
     A more sophisticated task duration estimator that uses machine learning
     to predict task durations based on task properties and user history.
+    
+    One model is trained on every user's history and shared; each user's
+    estimates are then corrected by their own scale and bias (see
+    with_adjustment and update_duration_adjustment).
     """
     
     def __init__(self, model_path=None):
@@ -20,13 +228,18 @@ class TaskDurationEstimator:
         self.vectorizer = None
         self.default_duration = 60  # Default duration in minutes
         
+        # Per-user correction: estimate * scale + bias minutes
+        self.scale = 1.0
+        self.bias = 0.0
+        
+        # (mtime, size) of the model file the model was saved to or loaded
+        # from; None while it only exists in memory
+        self.model_version = None
+        
         # Try to load pre-trained model if path is provided
         if model_path and os.path.exists(model_path):
             try:
-                with open(model_path, 'rb') as f:
-                    model_data = pickle.load(f)
-                    self.model = model_data['model']
-                    self.vectorizer = model_data['vectorizer']
+                self.load_model(model_path)
                 print(f"Loaded pre-trained model from {model_path}")
             except Exception as e:
                 print(f"Error loading model: {e}")
@@ -40,7 +253,7 @@ class TaskDurationEstimator:
         duration_mentions = self._extract_duration_mentions(text)
         
         # Count words as a proxy for complexity
-        word_count = len(re.findall(r'\b\w+\b', text))
+        word_count = len(_WORD_PATTERN.findall(text))
         
         # Extract category as a feature
         category_features = self._extract_category_features(category)
@@ -54,64 +267,17 @@ class TaskDurationEstimator:
     
     def _extract_duration_mentions(self, text):
         """Extract explicit mentions of time durations from text."""
-        # Look for patterns like "30 minutes", "2 hours", etc.
-        minute_pattern = r'(\d+)\s*(?:min(?:ute)?s?)'
-        hour_pattern = r'(\d+)\s*(?:hour|hr)s?'
-        
         minutes = 0
-        
-        # Extract minutes
-        minute_matches = re.findall(minute_pattern, text)
-        if minute_matches:
-            minutes += sum(int(m) for m in minute_matches)
-        
-        # Extract hours and convert to minutes
-        hour_matches = re.findall(hour_pattern, text)
-        if hour_matches:
-            minutes += sum(int(h) * 60 for h in hour_matches)
-        
+        if not any(unit in text for unit in _DURATION_UNITS):
+            # Most tasks mention no duration; skip the regex scan
+            return minutes
+        for amount, hours in _DURATION_PATTERN.findall(text):
+            minutes += int(amount) * 60 if hours else int(amount)
         return minutes
     
     def _extract_category_features(self, category):
         """Extract features from the task category."""
-        category = category.lower() if category else ""
-        
-        # Define category multipliers based on typical duration patterns
-        category_multipliers = {
-            'work': 1.2,
-            'study': 1.1,
-            'research': 1.3,
-            'writing': 1.2,
-            'reading': 0.9,
-            'email': 0.7,
-            'meeting': 1.0,
-            'call': 0.8,
-            'exercise': 0.8,
-            'personal': 0.9,
-            'shopping': 0.8,
-            'cleaning': 0.9,
-            'cooking': 0.8,
-            'travel': 1.1,
-            'project': 1.3,
-            'assignment': 1.2,
-            'exam': 1.2,
-            'presentation': 1.1,
-            'report': 1.2,
-            'planning': 0.9,
-            'design': 1.2,
-            'development': 1.3,
-            'testing': 1.0,
-            'debugging': 1.2,
-            'review': 0.9,
-            'analysis': 1.1
-        }
-        
-        # Find matching categories
-        multiplier = 1.0
-        for cat, mult in category_multipliers.items():
-            if cat in category:
-                multiplier = mult
-                break
+        multiplier = _category_multiplier(category.lower()) if category else 1.0
         
         return {
             'category_multiplier': multiplier
@@ -132,31 +298,109 @@ class TaskDurationEstimator:
             return features['duration_mentions']
         
         # If we have a trained model, use it
-        if self.model is not None and self.vectorizer is not None:
+        if self.has_trained_model():
             try:
-                # Transform text using vectorizer
-                text_features = self.vectorizer.transform([features['text']])
-                
-                # Combine with other features
-                X = np.hstack([
-                    text_features.toarray(),
-                    np.array([[
-                        features['word_count'],
-                        features['category_features']['category_multiplier']
-                    ]])
-                ])
+                # Transform text and combine with other features
+                X = self._feature_matrix([features])
                 
                 # Predict duration
                 predicted_duration = self.model.predict(X)[0]
                 
-                # Round to nearest 5 minutes and ensure minimum duration
-                return max(15, round(predicted_duration / 5) * 5)
+                return self._adjusted(predicted_duration)
             except Exception as e:
                 print(f"Error using ML model: {e}")
                 # Fall back to rule-based estimation
         
         # Rule-based estimation
-        return self._rule_based_estimation(title, description, category, features)
+        return self._adjusted(self._rule_based_estimation(title, description, category, features))
+    
+    def predict_durations(self, tasks):
+        """
+        Predict durations for many tasks at once.
+        
+        Gives the same results as predict_duration for each task, but the
+        learned model transforms and predicts all of them in one pass.
+        
+        Args:
+            tasks: Iterable of (title, description, category) tuples
+        
+        Returns:
+            List of durations in minutes, in the order of the tasks
+        """
+        tasks = list(tasks)
+        features_list = [self.extract_features(*task) for task in tasks]
+        durations = [features['duration_mentions'] or None for features in features_list]
+        remaining = [i for i, duration in enumerate(durations) if duration is None]
+        
+        if remaining and self.has_trained_model():
+            try:
+                X = self._feature_matrix([features_list[i] for i in remaining])
+                for i, predicted_duration in zip(remaining, self.model.predict(X)):
+                    durations[i] = self._adjusted(predicted_duration)
+                remaining = []
+            except Exception as e:
+                print(f"Error using ML model: {e}")
+        
+        for i in remaining:
+            durations[i] = self._adjusted(self._rule_based_estimation(*tasks[i], features_list[i]))
+        return durations
+    
+    def with_adjustment(self, scale, bias):
+        """
+        A copy of this estimator that corrects its estimates for one user.
+        
+        The copy shares the model and vectorizer, so it costs next to
+        nothing; estimates become estimate * scale + bias minutes, except
+        where the task states its duration explicitly.
+        """
+        estimator = copy.copy(self)
+        estimator.scale = scale
+        estimator.bias = bias
+        return estimator
+    
+    @property
+    def model_fingerprint(self):
+        """
+        Identifies the model behind the uncorrected estimates, so an
+        adjustment can tell whether it was fitted against this model.
+        
+        Returns:
+            'rules' without a model, the model file's mtime and size, or
+            None for a model that only exists in memory
+        """
+        if self.model is None:
+            return 'rules'
+        if self.model_version is None:
+            return None
+        return '%d-%d' % self.model_version
+    
+    def _adjusted(self, estimate):
+        """Apply the user's correction, round to the nearest 5 minutes and ensure minimum duration."""
+        return max(15, round((estimate * self.scale + self.bias) / 5) * 5)
+    
+    def has_trained_model(self):
+        """Whether a learned model is available and has seen enough feedback."""
+        if self.model is None or self.vectorizer is None:
+            return False
+        return getattr(self.model, 'n_seen', MIN_TRAINING_TASKS) >= MIN_TRAINING_TASKS
+    
+    def _feature_matrix(self, features_list, text_features=None):
+        """
+        Model input rows: the vectorized text followed by word count and category multiplier.
+        
+        The rows stay sparse, so their size follows the words in each task
+        rather than the size of the vocabulary.
+        
+        Args:
+            features_list: Output of extract_features for each row
+            text_features: The vectorized text, if already computed
+        """
+        if text_features is None:
+            text_features = self.vectorizer.transform([features['text'] for features in features_list])
+        return _append_columns(text_features, [
+            [features['word_count'], features['category_features']['category_multiplier']]
+            for features in features_list
+        ])
     
     def _rule_based_estimation(self, title, description, category, features=None):
         """Rule-based estimation as a fallback."""
@@ -176,39 +420,7 @@ class TaskDurationEstimator:
         estimated_duration *= features['category_features']['category_multiplier']
         
         # Simple keyword-based adjustments
-        text = features['text']
-        keywords = {
-            'quick': 0.5,
-            'brief': 0.5,
-            'short': 0.7,
-            'small': 0.7,
-            'simple': 0.7,
-            'easy': 0.7,
-            'basic': 0.8,
-            'medium': 1.0,
-            'average': 1.0,
-            'standard': 1.0,
-            'normal': 1.0,
-            'complex': 1.3,
-            'complicated': 1.3,
-            'difficult': 1.3,
-            'hard': 1.3,
-            'challenging': 1.3,
-            'long': 1.5,
-            'big': 1.5,
-            'large': 1.5,
-            'extensive': 1.8,
-            'comprehensive': 1.8,
-            'thorough': 1.8,
-            'detailed': 1.5,
-            'in-depth': 1.7
-        }
-        
-        # Check for keywords
-        for keyword, multiplier in keywords.items():
-            if keyword in text:
-                estimated_duration *= multiplier
-                break
+        estimated_duration *= _first_multiplier(_KEYWORD_TABLE, features['text'])
         
         # Round to nearest 5 minutes
         estimated_duration = round(estimated_duration / 5) * 5
@@ -230,104 +442,525 @@ class TaskDurationEstimator:
         # Filter tasks with actual duration
         tasks_with_duration = [t for t in tasks if t.actual_duration is not None]
         
-        if len(tasks_with_duration) < 5:
+        if len(tasks_with_duration) < MIN_TRAINING_TASKS:
             print(f"Not enough tasks with actual duration for training: {len(tasks_with_duration)}")
             return False
         
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LinearRegression
+        
         # Prepare training data
-        texts = []
-        features = []
-        durations = []
-        
-        for task in tasks_with_duration:
-            # Extract text features
-            text = f"{task.title} {task.description or ''} {task.category or ''}".lower()
-            texts.append(text)
-            
-            # Extract other features
-            task_features = self.extract_features(task.title, task.description or '', task.category or '')
-            features.append([
-                task_features['word_count'],
-                task_features['category_features']['category_multiplier']
-            ])
-            
-            # Target variable
-            durations.append(task.actual_duration)
+        features = [
+            self.extract_features(task.title, task.description or '', task.category or '')
+            for task in tasks_with_duration
+        ]
+        y = np.array([task.actual_duration for task in tasks_with_duration])
         
         # Create and fit vectorizer
         self.vectorizer = TfidfVectorizer(max_features=100)
-        text_features = self.vectorizer.fit_transform(texts)
+        text_features = self.vectorizer.fit_transform([task_features['text'] for task_features in features])
         
         # Combine features
-        X = np.hstack([text_features.toarray(), np.array(features)])
-        y = np.array(durations)
+        X = self._feature_matrix(features, text_features)
         
         # Train model
         self.model = LinearRegression()
         self.model.fit(X, y)
+        self.model_version = None
         
         print(f"Trained model on {len(tasks_with_duration)} tasks")
         return True
     
+    def learn_online(self, tasks):
+        """
+        Update an incremental model with tasks' actual durations.
+        
+        Text is hashed by a stateless HashingVectorizer and the regressor is
+        updated with partial_fit, so each task costs the same no matter how
+        much history came before it and memory stays constant. A model
+        trained with train_model is replaced by a new incremental one.
+        
+        Args:
+            tasks: Task objects (or objects with title, description, category
+                and actual_duration) to learn from
+        
+        Returns:
+            Number of tasks learned from
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        
+        tasks = [t for t in tasks if t.actual_duration is not None]
+        if not isinstance(self.model, OnlineDurationRegressor):
+            self.vectorizer = HashingVectorizer(n_features=2 ** 12, alternate_sign=False)
+            self.model = OnlineDurationRegressor()
+        if not tasks:
+            return 0
+        
+        features = [
+            self.extract_features(task.title, task.description or '', task.category or '')
+            for task in tasks
+        ]
+        self.model.partial_fit(self._feature_matrix(features), [task.actual_duration for task in tasks])
+        self.model_version = None
+        return len(tasks)
+    
     def save_model(self, model_path):
-        """Save the trained model to disk."""
+        """
+        Save the trained model to disk.
+        
+        Models are stored as NumPy arrays in an .npz file (the vocabulary,
+        IDF weights, coefficients and, for incremental models, the running
+        statistics), so loading one never unpickles anything.
+        """
         if self.model is None or self.vectorizer is None:
             print("No trained model to save")
             return False
         
         try:
+            arrays = self._model_arrays()
             model_dir = os.path.dirname(model_path)
             if not os.path.exists(model_dir):
                 os.makedirs(model_dir)
             
-            with open(model_path, 'wb') as f:
-                pickle.dump({
-                    'model': self.model,
-                    'vectorizer': self.vectorizer
-                }, f)
+            # Write to a temporary file and swap it in, so readers never
+            # see a half-written model
+            temp_path = f"{model_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            stat = os.stat(temp_path)
+            os.replace(temp_path, model_path)
+            self.model_version = (stat.st_mtime_ns, stat.st_size)
             print(f"Model saved to {model_path}")
+            estimator_cache.invalidate(model_path)
             return True
         except Exception as e:
             print(f"Error saving model: {e}")
             return False
     
-    def update_model_with_feedback(self, user_id):
-        """Update the model with new user feedback."""
-        # Get all tasks with actual duration for this user
-        tasks = Task.query.filter_by(user_id=user_id).filter(Task.actual_duration.isnot(None)).all()
+    def load_model(self, model_path):
+        """
+        Load a model written by save_model.
         
-        if not tasks or len(tasks) < 5:
-            print(f"Not enough tasks with feedback for user {user_id}")
-            return False
+        Raises:
+            ValueError: If the file was written in another format version
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+        from sklearn.linear_model import LinearRegression
         
-        # Train model with these tasks
-        success = self.train_model(tasks)
+        with open(model_path, 'rb') as f, np.load(f, allow_pickle=False) as arrays:
+            stat = os.fstat(f.fileno())
+            if int(arrays['format']) != MODEL_FORMAT_VERSION:
+                raise ValueError(f"Unsupported model format {int(arrays['format'])}")
+            
+            if str(arrays['vectorizer']) == 'hashing':
+                vectorizer = HashingVectorizer(n_features=int(arrays['n_features']), alternate_sign=False)
+            else:
+                vectorizer = TfidfVectorizer(vocabulary={
+                    term: column for column, term in enumerate(arrays['vocabulary'].tolist())
+                })
+                vectorizer.idf_ = arrays['idf']
+            
+            if str(arrays['model']) == 'online':
+                model = OnlineDurationRegressor.from_arrays(arrays)
+            else:
+                model = LinearRegression()
+                model.coef_ = arrays['coef']
+                model.intercept_ = float(arrays['intercept'])
+                model.n_features_in_ = len(model.coef_)
+        
+        self.model = model
+        self.vectorizer = vectorizer
+        self.model_version = (stat.st_mtime_ns, stat.st_size)
+    
+    def _model_arrays(self):
+        """The model and vectorizer as a dict of NumPy arrays, in the layout load_model reads."""
+        from sklearn.feature_extraction.text import HashingVectorizer
+        
+        if isinstance(self.vectorizer, HashingVectorizer):
+            arrays = {
+                'vectorizer': np.array('hashing'),
+                'n_features': np.array(self.vectorizer.n_features)
+            }
+        else:
+            vocabulary = self.vectorizer.vocabulary_
+            arrays = {
+                'vectorizer': np.array('tfidf'),
+                'vocabulary': np.array(sorted(vocabulary, key=vocabulary.get), dtype=str),
+                'idf': self.vectorizer.idf_
+            }
+        
+        if isinstance(self.model, OnlineDurationRegressor):
+            arrays.update(self.model.to_arrays(), model=np.array('online'))
+        else:
+            arrays.update(
+                model=np.array('linear'),
+                coef=self.model.coef_,
+                intercept=np.array(self.model.intercept_)
+            )
+        arrays['format'] = np.array(MODEL_FORMAT_VERSION)
+        return arrays
+    
+    def update_global_model(self, new_tasks=None):
+        """
+        Update the model shared by all users with new feedback.
+        
+        Without new_tasks this retrains from every user's history. With
+        them, an incremental model is updated with just those tasks; the
+        first time, it learns the whole history once instead. Request
+        handlers should go through app.jobs.ModelRetrainer rather than
+        calling this directly.
+        
+        Args:
+            new_tasks: Tasks whose feedback is new, for incremental updates
+        """
+        if new_tasks is not None:
+            if not isinstance(self.model, OnlineDurationRegressor):
+                new_tasks = _feedback_history()
+            self.learn_online(new_tasks)
+            success = True
+        else:
+            success = self.train_model(_feedback_history())
         
         if success:
-            # Save model to user-specific path
-            model_dir = os.path.join('app', 'models', 'trained', str(user_id))
-            if not os.path.exists(model_dir):
-                os.makedirs(model_dir)
-            
-            model_path = os.path.join(model_dir, 'duration_model.pkl')
-            self.save_model(model_path)
+            model_path = _global_model_path()
+            if self.save_model(model_path):
+                estimator_cache.put(model_path, self)
         
         return success
 
+class EstimatorCache:
+    """
+    LRU cache of estimators loaded from model files.
+    
+    Entries are keyed by model path and remember the file's modification
+    time and size, so a model that was retrained on disk is reloaded on
+    the next lookup. The cache is bounded by the total size of the cached
+    model files, a cheap stand-in for the memory the loaded models use.
+    """
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Memory budget, measured in model file bytes
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, model_path):
+        """
+        Get the estimator for a model file, loading it if needed.
+        
+        Returns:
+            TaskDurationEstimator, or None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(model_path)
+        except OSError:
+            self.invalidate(model_path)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            entry = self._entries.get(model_path)
+            if entry is not None and entry[1] == version:
+                self._entries.move_to_end(model_path)
+                return entry[0]
+        
+        # Load outside the lock so other models stay available meanwhile
+        estimator = TaskDurationEstimator(model_path=model_path)
+        if estimator.model is None:
+            return estimator
+        
+        self._store(model_path, estimator, version, stat.st_size)
+        return estimator
+    
+    def put(self, model_path, estimator):
+        """
+        Cache an estimator that was just saved to a model file.
+        
+        The estimator must not be changed afterwards, as it is shared with
+        every request that looks the model up.
+        """
+        try:
+            stat = os.stat(model_path)
+        except OSError:
+            return
+        self._store(model_path, estimator, (stat.st_mtime_ns, stat.st_size), stat.st_size)
+    
+    def invalidate(self, model_path):
+        """Drop the cached estimator for a model file."""
+        with self._lock:
+            self._discard(model_path)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def _store(self, model_path, estimator, version, size):
+        with self._lock:
+            self._discard(model_path)
+            if size <= self.max_bytes:
+                self._entries[model_path] = (estimator, version, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+    
+    def _discard(self, model_path):
+        entry = self._entries.pop(model_path, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+    
+    def __len__(self):
+        return len(self._entries)
+
+class EstimateCache:
+    """
+    Short-lived LRU memo of duration estimates.
+    
+    Keys come from estimate_key, so they change whenever the code, the
+    shared model or the user's adjustment does; entries also expire after
+    a TTL. Users without an adjustment share entries. While an estimate
+    is being computed, identical requests wait for it instead of
+    computing it again.
+    """
+    
+    def __init__(self, max_entries=10000, ttl=300):
+        """
+        Args:
+            max_entries: Most estimates kept
+            ttl: Seconds an estimate is kept
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached estimate for a key, computing it at most once.
+        
+        Args:
+            key: Output of estimate_key
+            compute: Function returning the estimate on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            
+            pending = self._pending.get(key)
+            computing = pending is None
+            if computing:
+                pending = self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not computing:
+            # Another request is computing this estimate
+            return pending.result()
+        
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+        
+        with self._lock:
+            del self._pending[key]
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        pending.set_result(value)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+# Loaded models, shared by all requests
+estimator_cache = EstimatorCache()
+
+# Recent estimates, shared by all requests
+estimate_cache = EstimateCache()
+
+def preload_ml_stack():
+    """
+    Import scikit-learn and SciPy in a background thread.
+    
+    Otherwise the first estimate that uses a learned model pays for the
+    import; preloading moves that cost off the request path without
+    delaying startup.
+    
+    Returns:
+        The started daemon thread
+    """
+    thread = threading.Thread(target=_import_ml_stack, name='ml-preload', daemon=True)
+    thread.start()
+    return thread
+
+def _import_ml_stack():
+    import scipy.sparse
+    import sklearn.feature_extraction.text
+    import sklearn.linear_model
+    import sklearn.preprocessing
+
+def _global_model_path():
+    """Path of the duration model shared by all users, in the app's DURATION_MODEL_DIR."""
+    return os.path.join(current_app.config['DURATION_MODEL_DIR'], 'global.npz')
+
+def _feedback_history(user_id=None):
+    """Title, description, category and actual duration of every task with feedback, optionally for one user."""
+    query = db.session.query(Task.title, Task.description, Task.category, Task.actual_duration)
+    query = query.filter(Task.actual_duration.isnot(None))
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+    return query.all()
+
+def fit_duration_adjustment(estimates, actual_durations, prior_weight=ADJUSTMENT_PRIOR_WEIGHT):
+    """
+    Fit actual = estimate * scale + bias, shrunk towards no correction.
+    
+    A ridge fit of the deviation from (scale 1, bias 0), where the penalty
+    is worth prior_weight tasks, so a user's first few tasks only nudge
+    their estimates and a consistent pattern takes over as tasks add up.
+    
+    Returns:
+        Tuple of (scale, bias)
+    """
+    estimates = np.asarray(estimates, dtype=float)
+    residuals = np.asarray(actual_durations, dtype=float) - estimates
+    if not len(estimates):
+        return 1.0, 0.0
+    
+    # The scale penalty is weighted by the mean estimate, so both terms are in minutes
+    mean_estimate = estimates.mean()
+    normal_matrix = np.array([
+        [estimates @ estimates + prior_weight * mean_estimate ** 2, estimates.sum()],
+        [estimates.sum(), len(estimates) + prior_weight]
+    ])
+    scale_offset, bias = np.linalg.solve(normal_matrix, [estimates @ residuals, residuals.sum()])
+    scale = min(max(1.0 + scale_offset, MIN_ADJUSTMENT_SCALE), MAX_ADJUSTMENT_SCALE)
+    return float(scale), float(bias)
+
+def update_duration_adjustment(user_id):
+    """
+    Refit a user's correction to the global model from their feedback.
+    
+    Tasks that state their duration explicitly are left out, as their
+    estimates are never corrected.
+    
+    Returns:
+        The user's DurationAdjustment
+    """
+    estimator = get_duration_estimator()
+    rows, actual_durations = [], []
+    for task in _feedback_history(user_id):
+        row = (task.title, task.description or '', task.category or '')
+        if not estimator.extract_features(*row)['duration_mentions']:
+            rows.append(row)
+            actual_durations.append(task.actual_duration)
+    scale, bias = fit_duration_adjustment(estimator.predict_durations(rows), actual_durations)
+    
+    adjustment = DurationAdjustment.query.filter_by(user_id=user_id).first()
+    if adjustment is None:
+        adjustment = DurationAdjustment(user_id=user_id)
+        db.session.add(adjustment)
+    adjustment.scale = scale
+    adjustment.bias = bias
+    adjustment.sample_count = len(rows)
+    adjustment.model_version = estimator.model_fingerprint
+    db.session.commit()
+    return adjustment
+
+def stale_duration_adjustments():
+    """
+    Find the users whose adjustment was fitted against an older global model.
+    
+    Returns:
+        List of user IDs
+    """
+    fingerprint = get_duration_estimator().model_fingerprint
+    rows = db.session.query(DurationAdjustment.user_id).filter(or_(
+        DurationAdjustment.model_version.is_(None),
+        DurationAdjustment.model_version != fingerprint
+    ))
+    return [user_id for (user_id,) in rows]
+
 # Function to get user-specific estimator
 def get_duration_estimator(user_id=None):
-    """Get a duration estimator, optionally user-specific if trained model exists."""
+    """
+    Get a duration estimator, corrected for the user if they have feedback.
+    
+    The global model is served from estimator_cache, so only the first
+    request after it changes reads it from disk; a user's estimator is a
+    cheap copy of it carrying their scale and bias. An adjustment fitted
+    against another model is ignored until it is refitted, as the current
+    model may already have learned what it corrects for.
+    """
+    estimator = estimator_cache.get(_global_model_path())
+    if estimator is None:
+        # Fall back to default estimator
+        estimator = TaskDurationEstimator()
+    
     if user_id:
-        # Check for user-specific model
-        model_path = os.path.join('app', 'models', 'trained', str(user_id), 'duration_model.pkl')
-        if os.path.exists(model_path):
-            return TaskDurationEstimator(model_path=model_path)
+        adjustment = DurationAdjustment.query.filter_by(user_id=user_id).first()
+        if adjustment is not None and adjustment.model_version == estimator.model_fingerprint:
+            estimator = estimator.with_adjustment(adjustment.scale, adjustment.bias)
+    return estimator
+
+def estimate_key(estimator, title, description, category):
+    """
+    Cache key of an estimate, starting with what it was computed by.
     
-    # Fall back to default estimator
-    return TaskDurationEstimator()
+    Case and runs of whitespace never change an estimate, so the text is
+    normalized, which lets slightly different spellings share entries.
+    """
+    return (
+        ESTIMATOR_VERSION, estimator.model_version, estimator.scale, estimator.bias,
+        ' '.join((title or '').split()).lower(),
+        ' '.join((description or '').split()).lower(),
+        ' '.join((category or '').split()).lower()
+    )
+
+def estimate_etag(key):
+    """HTTP entity tag of an estimate, derived from its cache key alone."""
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+def cached_estimate(estimator, key):
+    """Estimate the task a key describes, through estimate_cache."""
+    return estimate_cache.get_or_compute(key, lambda: estimator.predict_duration(*key[-3:]))
 
 # Function to suggest task duration
 def suggest_task_duration(title, description, category, user_id=None):
     """Suggest a task duration based on task properties and user history."""
     estimator = get_duration_estimator(user_id)
-    return estimator.predict_duration(title, description, category, user_id)
+    return cached_estimate(estimator, estimate_key(estimator, title, description, category))
+
+def suggest_task_durations(tasks, user_id=None):
+    """
+    Suggest durations for many tasks with one model pass.
+    
+    Args:
+        tasks: Iterable of (title, description, category) tuples
+        user_id: User whose adjustment to apply, if they have one
+    
+    Returns:
+        List of durations in minutes
+    """
+    return get_duration_estimator(user_id).predict_durations(tasks)
@@ -14,6 +14,7 @@ class User(UserMixin, db.Model):
     tasks = db.relationship('Task', backref='user', lazy='dynamic')
     scheduled_blocks = db.relationship('ScheduledBlock', backref='user', lazy='dynamic')
     preferences = db.relationship('UserPreferences', backref='user', uselist=False)
+    duration_adjustment = db.relationship('DurationAdjustment', backref='user', uselist=False)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -36,6 +37,27 @@ class UserPreferences(db.Model):
     def __repr__(self):
         return f'<UserPreferences for User {self.user_id}>'
 
+class DurationAdjustment(db.Model):
+    """A user's correction to the shared duration model: estimate * scale + bias."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    scale = db.Column(db.Float, default=1.0)
+    bias = db.Column(db.Float, default=0.0)  # minutes
+    sample_count = db.Column(db.Integer, default=0)  # tasks it was fitted on
+    model_version = db.Column(db.String(64))  # model_fingerprint of the global model it was fitted against
+    
+    def __repr__(self):
+        return f'<DurationAdjustment for User {self.user_id}>'
+
+class ScheduleVersion(db.Model):
+    """Counter bumped whenever a user's fixed schedule changes, for cache invalidation."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ScheduleVersion {self.version} for User {self.user_id}>'
+
 class FixedScheduleItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -0,0 +1,110 @@
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+class PhaseRecord:
+    """Measurements of one scheduling phase."""
+    
+    __slots__ = ('name', 'seconds', 'count', 'allocated_bytes', 'peak_bytes')
+    
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.count = None
+        self.allocated_bytes = None
+        self.peak_bytes = None
+    
+    def to_dict(self):
+        return {
+            'phase': self.name,
+            'ms': round(self.seconds * 1000, 3),
+            'count': self.count,
+            'allocated_bytes': self.allocated_bytes,
+            'peak_bytes': self.peak_bytes
+        }
+
+class SchedulingProfile:
+    """
+    Opt-in per-phase instrumentation for IntelligentScheduler.
+    
+    Pass one to the scheduler and every phase it runs (loading, recurrence
+    expansion, free-block computation, assignment, persistence) is
+    recorded with its wall time and the number of items it produced.
+    Allocation tracking uses tracemalloc and slows the run down noticeably,
+    so it is off unless asked for.
+    """
+    
+    def __init__(self, trace_allocations=False):
+        """
+        Args:
+            trace_allocations: Also record net and peak memory allocated per phase
+        """
+        self.trace_allocations = trace_allocations
+        self.phases = []
+    
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a block of code as one phase.
+        
+        Yields:
+            The PhaseRecord, so the block can set its count
+        """
+        record = PhaseRecord(name)
+        started_tracing = False
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - started
+            if self.trace_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                record.allocated_bytes = current - memory_before
+                record.peak_bytes = peak - memory_before
+                if started_tracing:
+                    tracemalloc.stop()
+            self.phases.append(record)
+    
+    @property
+    def total_seconds(self):
+        return sum(record.seconds for record in self.phases)
+    
+    def to_dict(self):
+        return {
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'phases': [record.to_dict() for record in self.phases]
+        }
+    
+    def log(self, logger, level=logging.INFO, **fields):
+        """
+        Log one JSON record per phase.
+        
+        Args:
+            logger: Logger to write to
+            level: Logging level of the records
+            **fields: Extra fields for every record, such as the user ID
+        """
+        for record in self.phases:
+            logger.log(level, json.dumps(dict(fields, event='scheduler_phase', **record.to_dict())))
+
+class _UnrecordedPhase:
+    """Stand-in for PhaseRecord when a scheduler isn't being profiled."""
+    
+    __slots__ = ()
+    
+    def __setattr__(self, name, value):
+        pass
+
+@contextmanager
+def unrecorded_phase(name):
+    """Context manager with the same shape as SchedulingProfile.phase that records nothing."""
+    yield _UnrecordedPhase()
@@ -0,0 +1,105 @@
+import calendar
+import datetime
+from app.models.scheduling_core import (
+    MINUTES_PER_DAY, to_epoch_minutes, date_to_epoch_minutes, time_to_minutes
+)
+
+def iter_occurrences(item, start_date, end_date):
+    """
+    Lazily yield the occurrences of a fixed schedule item within a date range.
+    
+    Instead of walking the calendar day by day, the first occurrence inside
+    the range is computed directly and the generator then steps by the
+    pattern stride, so the cost is proportional to the number of
+    occurrences produced.
+    
+    Args:
+        item: FixedScheduleItem (or any object with the same attributes)
+        start_date: First date of the range (inclusive)
+        end_date: Last date of the range (inclusive)
+    
+    Yields:
+        (start_time, end_time) datetime tuples, in chronological order
+    """
+    # Non-recurring items occur once, on their own date
+    if item.recurrence_pattern in (None, 'none'):
+        if start_date <= item.start_time.date() <= end_date:
+            yield item.start_time, item.end_time
+        return
+    
+    # Each instance keeps the item's time of day; an end time earlier than
+    # the start time means the instance spans to the next day
+    start_of_day = item.start_time.time()
+    length = (datetime.datetime.combine(item.start_time.date(), item.end_time.time()) -
+              datetime.datetime.combine(item.start_time.date(), start_of_day))
+    if length < datetime.timedelta(0):
+        length += datetime.timedelta(days=1)
+    
+    for current_date in _iter_recurrence_dates(item, start_date, end_date):
+        start_time = datetime.datetime.combine(current_date, start_of_day)
+        yield start_time, start_time + length
+
+def iter_occurrence_minutes(item, start_date, end_date):
+    """
+    Like iter_occurrences, but yield (start, end) as integer minutes since
+    the epoch, so no datetime objects are built per occurrence.
+    """
+    if item.recurrence_pattern in (None, 'none'):
+        if start_date <= item.start_time.date() <= end_date:
+            yield to_epoch_minutes(item.start_time), to_epoch_minutes(item.end_time)
+        return
+    
+    start_of_day = time_to_minutes(item.start_time)
+    length = (time_to_minutes(item.end_time) - start_of_day) % MINUTES_PER_DAY
+    
+    for current_date in _iter_recurrence_dates(item, start_date, end_date):
+        start = date_to_epoch_minutes(current_date) + start_of_day
+        yield start, start + length
+
+def _iter_recurrence_dates(item, start_date, end_date):
+    """Yield the dates a recurring item occurs on within a date range."""
+    anchor = item.start_time.date()
+    first_date = max(start_date, anchor)
+    last_date = min(end_date, item.recurrence_end_date or end_date)
+    if first_date > last_date:
+        return
+    yield from _iter_dates(item.recurrence_pattern, anchor, first_date, last_date)
+
+def _iter_dates(pattern, anchor, first_date, last_date):
+    """Yield the dates matching a recurrence pattern between two dates."""
+    if pattern == 'daily':
+        current_date = first_date
+        step = datetime.timedelta(days=1)
+    elif pattern == 'weekly':
+        # Jump to the first date on the anchor's weekday
+        current_date = first_date + datetime.timedelta(days=(anchor.weekday() - first_date.weekday()) % 7)
+        step = datetime.timedelta(days=7)
+    elif pattern == 'monthly':
+        yield from _iter_monthly_dates(anchor.day, first_date, last_date)
+        return
+    else:
+        return
+    
+    while current_date <= last_date:
+        yield current_date
+        current_date += step
+
+def _iter_monthly_dates(day, first_date, last_date):
+    """
+    Yield the given day of every month between two dates.
+    
+    Months that are too short for the day use their last day instead.
+    """
+    year, month = first_date.year, first_date.month
+    while True:
+        current_date = datetime.date(year, month, min(day, calendar.monthrange(year, month)[1]))
+        if current_date > last_date:
+            return
+        if current_date >= first_date:
+            yield current_date
+        
+        # Move to the next month
+        if month == 12:
+            year, month = year + 1, 1
+        else:
+            month += 1
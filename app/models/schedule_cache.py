@@ -0,0 +1,120 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from app import db
+from app.models.models import ScheduleVersion
+
+# Approximate memory held by one cached (start, end) pair of epoch minutes
+_INTERVAL_BYTES = sys.getsizeof((0, 0)) + 2 * sys.getsizeof(2 ** 30)
+
+def init_schedule_cache(app):
+    """Attach a free/busy cache to the app."""
+    app.extensions['free_busy_cache'] = FreeBusyCache(
+        app.config.get('FREE_BUSY_CACHE_BYTES', 32 * 1024 * 1024),
+        app.config.get('FREE_BUSY_CACHE_TTL', 300)
+    )
+
+def get_free_busy_cache():
+    """The current app's free/busy cache, or None outside an app context."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('free_busy_cache')
+
+def get_schedule_version(user_id):
+    """Current version of a user's fixed schedule, as stored in the database."""
+    version = db.session.query(ScheduleVersion.version).filter_by(user_id=user_id).scalar()
+    return version or 0
+
+def bump_schedule_version(user_id):
+    """
+    Record that a user's fixed schedule changed.
+    
+    Call this in the transaction that edits the schedule; once it commits,
+    every process stops using the intervals it cached for the user.
+    """
+    table = ScheduleVersion.__table__
+    updated = db.session.execute(
+        table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+    )
+    if updated.rowcount == 0:
+        db.session.execute(table.insert().values(user_id=user_id, version=1))
+
+class FreeBusyCache:
+    """
+    LRU cache of users' expanded fixed schedules.
+    
+    Entries are interval lists (busy time from fixed items, or the free
+    blocks left around them) keyed by user, window, the user's schedule
+    version and whatever else the caller needs, such as preferences. The
+    version lives in the database and is bumped with every edit of the
+    fixed schedule, so an edit made by any process changes the keys every
+    process looks up. Entries also expire after a while, as a backstop for
+    edits that bypass the version.
+    
+    The cache is bounded by an estimate of the memory its entries hold and
+    evicts least recently used entries to stay below it.
+    """
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        """
+        Args:
+            max_bytes: Memory budget for cached intervals
+            ttl: Seconds an entry may be used for
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Look up a list of (start, end) intervals.
+        
+        Args:
+            key: Tuple starting with the user ID and their schedule version
+        
+        Returns:
+            The cached tuple of intervals, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, intervals):
+        """Cache a list of (start, end) intervals under a key built like get's."""
+        intervals = tuple(intervals)
+        size = sys.getsizeof(intervals) + len(intervals) * _INTERVAL_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (intervals, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+    
+    def __len__(self):
+        return len(self._entries)
@@ -1,203 +1,301 @@
+import bisect
 import datetime
-import numpy as np
-from app.models.models import FixedScheduleItem, Task, ScheduledBlock
+from collections import defaultdict
+from sqlalchemy import func
+from app.models.models import FixedScheduleItem, Task, TaskDependency, ScheduledBlock, UserPreferences
+from app.models.recurrence import iter_occurrences, iter_occurrence_minutes
+from app.models.availability import AvailabilityBitmap
+from app.models.profiling import unrecorded_phase
+from app.models.schedule_cache import get_free_busy_cache, get_schedule_version
+from app.models.scheduling_core import (
+    TaskSpec, SchedulingPreferences, SchedulingWindow, FixedOccurrence, FreeBlock, merge_intervals,
+    to_epoch_minutes, compute_free_blocks, task_score, score_matrix, plan_schedule
+)
 from app import db
-from flask_login import current_user
+
+# Marks constructor data that should be loaded from the database
+_LOAD = object()
+
+class ScheduleChange:
+    """A single edit to a user's tasks or fixed schedule."""
+    
+    TASK_ADDED = 'task_added'
+    TASK_UPDATED = 'task_updated'
+    TASK_DELETED = 'task_deleted'
+    TASK_COMPLETED = 'task_completed'
+    ITEM_ADDED = 'item_added'
+    ITEM_UPDATED = 'item_updated'
+    ITEM_DELETED = 'item_deleted'
+    
+    def __init__(self, kind, task_id=None, item_id=None):
+        """
+        Args:
+            kind: One of the change kinds above
+            task_id: ID of the task the change is about
+            item_id: ID of the fixed schedule item the change is about
+        """
+        self.kind = kind
+        self.task_id = task_id
+        self.item_id = item_id
+    
+    def __repr__(self):
+        return f'<ScheduleChange {self.kind} task={self.task_id} item={self.item_id}>'
 
 class IntelligentScheduler:
     """
     Intelligent scheduling algorithm that finds optimal time blocks
     for tasks based on fixed schedule, task properties, and user preferences.
+    
+    This class loads a user's data from the database and persists the
+    results; the planning itself happens in app.models.scheduling_core.
     """
     
-    def __init__(self, user_id, start_date=None, end_date=None, min_block_duration=15):
+    def __init__(self, user_id, start_date=None, end_date=None, min_block_duration=15,
+                 preferences=_LOAD, fixed_items=None, pending_tasks=None, dependencies=None,
+                 free_time_engine='intervals', profile=None, cache=_LOAD):
         """
         Initialize the scheduler with user-specific parameters.
         
+        The user's preferences, fixed schedule items and pending tasks are
+        queried on demand unless they are passed in, which lets batch jobs
+        load the data for many users in bulk.
+        
         Args:
             user_id: ID of the user to generate schedule for
             start_date: Start date for scheduling (defaults to today)
             end_date: End date for scheduling (defaults to 7 days from start)
             min_block_duration: Minimum duration (in minutes) for a free time block
+            preferences: Preloaded UserPreferences, or None if the user has none
+            fixed_items: Preloaded list of the user's FixedScheduleItem objects
+            pending_tasks: Preloaded list of the user's pending Task objects
+            dependencies: Preloaded list of the user's (prerequisite_id, dependent_id) pairs
+            free_time_engine: 'intervals' to sweep merged busy intervals, or
+                'bitmap' to paint them onto a per-minute AvailabilityBitmap
+            profile: Optional SchedulingProfile to record each phase's cost in
+            cache: FreeBusyCache for the expanded fixed schedule; defaults to
+                the app's cache unless fixed_items are passed in, None disables it
         """
         self.user_id = user_id
         self.start_date = start_date or datetime.datetime.now().date()
         self.end_date = end_date or (self.start_date + datetime.timedelta(days=7))
         self.min_block_duration = min_block_duration
+        self.fixed_items = fixed_items
+        self.pending_tasks = pending_tasks
+        self.dependencies = dependencies
+        self.free_time_engine = free_time_engine
+        self.profile = profile
+        if cache is _LOAD:
+            cache = get_free_busy_cache() if fixed_items is None else None
+        self.cache = cache
+        self._schedule_version = None
         
         # Get user preferences (default values if not set)
         self.start_day_time = datetime.time(8, 0)  # 8:00 AM
         self.end_day_time = datetime.time(22, 0)   # 10:00 PM
         
         # Load user preferences if available
-        from app.models.models import UserPreferences
-        user_prefs = UserPreferences.query.filter_by(user_id=user_id).first()
-        if user_prefs:
-            self.start_day_time = user_prefs.start_day_time
-            self.end_day_time = user_prefs.end_day_time
-            self.min_block_duration = user_prefs.min_break_duration
+        if preferences is _LOAD:
+            preferences = UserPreferences.query.filter_by(user_id=user_id).first()
+        if preferences:
+            self.start_day_time = preferences.start_day_time
+            self.end_day_time = preferences.end_day_time
+            self.min_block_duration = preferences.min_break_duration
     
-    def get_fixed_schedule_items(self):
-        """Get all fixed schedule items for the user within the date range."""
-        # Get base items
-        items = FixedScheduleItem.query.filter_by(user_id=self.user_id).all()
-        
-        # Expand recurring items
-        expanded_items = []
-        
+    def _phase(self, name):
+        """Context manager recording a phase in the profile, if there is one."""
+        if self.profile is None:
+            return unrecorded_phase(name)
+        return self.profile.phase(name)
+    
+    def _load_fixed_items(self):
+        if self.fixed_items is not None:
+            return self.fixed_items
+        with self._phase('load_fixed_items') as phase:
+            items = FixedScheduleItem.query.filter_by(user_id=self.user_id).all()
+            phase.count = len(items)
+        return items
+    
+    def _expand_fixed_items(self, items):
         for item in items:
-            # For non-recurring items, check if they're in our date range
-            if item.recurrence_pattern == 'none':
-                if item.start_time.date() >= self.start_date and item.start_time.date() <= self.end_date:
-                    expanded_items.append(item)
-                continue
-            
-            # For recurring items, generate instances within our date range
-            current_date = max(self.start_date, item.start_time.date())
-            end_recurrence = item.recurrence_end_date or self.end_date
-            
-            while current_date <= min(self.end_date, end_recurrence):
-                # Check if this instance should be included based on recurrence pattern
-                include = False
-                
-                if item.recurrence_pattern == 'daily':
-                    include = True
-                elif item.recurrence_pattern == 'weekly' and current_date.weekday() == item.start_time.date().weekday():
-                    include = True
-                elif item.recurrence_pattern == 'monthly' and current_date.day == item.start_time.date().day:
-                    include = True
-                
-                if include:
-                    # Create a new datetime for this instance
-                    start_time = datetime.datetime.combine(
-                        current_date,
-                        item.start_time.time()
-                    )
-                    end_time = datetime.datetime.combine(
-                        current_date,
-                        item.end_time.time()
-                    )
-                    
-                    # If end time is earlier than start time, it spans to the next day
-                    if end_time < start_time:
-                        end_time += datetime.timedelta(days=1)
-                    
-                    # Create a virtual item for this instance
-                    expanded_items.append({
-                        'id': item.id,
-                        'title': item.title,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'priority': item.priority
-                    })
-                
-                # Move to next day
-                if item.recurrence_pattern == 'daily':
-                    current_date += datetime.timedelta(days=1)
-                elif item.recurrence_pattern == 'weekly':
-                    current_date += datetime.timedelta(days=7)
-                elif item.recurrence_pattern == 'monthly':
-                    # Move to the same day next month
-                    if current_date.month == 12:
-                        next_month = 1
-                        next_year = current_date.year + 1
-                    else:
-                        next_month = current_date.month + 1
-                        next_year = current_date.year
-                    
-                    # Handle month length differences
-                    try:
-                        current_date = current_date.replace(year=next_year, month=next_month)
-                    except ValueError:
-                        # Day doesn't exist in next month, use last day
-                        if next_month == 2:
-                            # February special case
-                            if (next_year % 4 == 0 and next_year % 100 != 0) or next_year % 400 == 0:
-                                current_date = current_date.replace(year=next_year, month=next_month, day=29)
-                            else:
-                                current_date = current_date.replace(year=next_year, month=next_month, day=28)
-                        else:
-                            # Use last day of month
-                            last_day = 30 if next_month in [4, 6, 9, 11] else 31
-                            current_date = current_date.replace(year=next_year, month=next_month, day=last_day)
-        
-        return expanded_items
-    
-    def get_free_time_blocks(self):
+            for start, end in iter_occurrence_minutes(item, self.start_date, self.end_date):
+                yield FixedOccurrence(item.id, start, end)
+    
+    def iter_fixed_occurrences(self):
         """
-        Identify all free time blocks between fixed schedule items.
+        Lazily yield every occurrence of the user's fixed schedule items
+        within the date range.
         
-        Returns:
-            List of dictionaries with start_time and end_time for each free block
+        Yields:
+            FixedOccurrence objects
+        """
+        return self._expand_fixed_items(self._load_fixed_items())
+    
+    def get_fixed_schedule_items(self):
+        """Get all fixed schedule item occurrences for the user within the date range."""
+        return list(self.iter_fixed_occurrences())
+    
+    @property
+    def window(self):
+        """The scheduling date range as a SchedulingWindow."""
+        return SchedulingWindow(self.start_date, self.end_date)
+    
+    @property
+    def preferences(self):
+        """The user's scheduling preferences as a SchedulingPreferences."""
+        return SchedulingPreferences(self.start_day_time, self.end_day_time, self.min_block_duration)
+    
+    @property
+    def schedule_version(self):
+        """Version of the user's fixed schedule, read from the database once per scheduler."""
+        if self._schedule_version is None:
+            self._schedule_version = get_schedule_version(self.user_id)
+        return self._schedule_version
+    
+    def get_free_time_blocks(self, busy_intervals=()):
         """
-        fixed_items = self.get_fixed_schedule_items()
+        Identify all free time blocks between fixed schedule items.
         
-        # Sort fixed items by start time
-        fixed_items.sort(key=lambda x: x['start_time'] if isinstance(x, dict) else x.start_time)
+        The expanded fixed schedule is cached per user and window, and so
+        are the free blocks unless extra busy intervals are given.
         
-        free_blocks = []
-        current_date = self.start_date
+        Args:
+            busy_intervals: Additional (start_time, end_time) pairs to treat as
+                busy, such as placements that are kept in the plan
         
-        # Process each day in the date range
-        while current_date <= self.end_date:
-            # Start of day's available time
-            day_start = datetime.datetime.combine(current_date, self.start_day_time)
-            day_end = datetime.datetime.combine(current_date, self.end_day_time)
-            
-            # Get fixed items for this day
-            day_items = [
-                item for item in fixed_items 
-                if (isinstance(item, dict) and item['start_time'].date() == current_date) or
-                   (not isinstance(item, dict) and item.start_time.date() == current_date)
-            ]
-            
-            if not day_items:
-                # No fixed items today, entire day is free
-                if (day_end - day_start).total_seconds() / 60 >= self.min_block_duration:
-                    free_blocks.append({
-                        'start_time': day_start,
-                        'end_time': day_end,
-                        'duration_minutes': (day_end - day_start).total_seconds() / 60
-                    })
+        Returns:
+            Chronological list of FreeBlock objects
+        """
+        free_blocks_key = None
+        if self.cache is not None and not busy_intervals:
+            free_blocks_key = (self.user_id, self.schedule_version, 'free',
+                               self.start_date, self.end_date, self.preferences)
+            cached = self.cache.get(free_blocks_key)
+            if cached is not None:
+                with self._phase('free_busy_cache') as phase:
+                    free_blocks = [FreeBlock(start, end) for start, end in cached]
+                    phase.count = len(free_blocks)
+                return free_blocks
+        
+        intervals = self._fixed_intervals()
+        with self._phase('free_blocks') as phase:
+            intervals.extend((to_epoch_minutes(start_time), to_epoch_minutes(end_time))
+                             for start_time, end_time in busy_intervals)
+            if self.free_time_engine == 'bitmap':
+                availability = AvailabilityBitmap(self.window, self.preferences)
+                availability.paint_busy(intervals)
+                free_blocks = availability.free_blocks(self.min_block_duration)
             else:
-                # Check for free time before first item
-                first_item_start = day_items[0]['start_time'] if isinstance(day_items[0], dict) else day_items[0].start_time
-                if first_item_start > day_start and (first_item_start - day_start).total_seconds() / 60 >= self.min_block_duration:
-                    free_blocks.append({
-                        'start_time': day_start,
-                        'end_time': first_item_start,
-                        'duration_minutes': (first_item_start - day_start).total_seconds() / 60
-                    })
-                
-                # Check for free time between items
-                for i in range(len(day_items) - 1):
-                    current_item_end = day_items[i]['end_time'] if isinstance(day_items[i], dict) else day_items[i].end_time
-                    next_item_start = day_items[i+1]['start_time'] if isinstance(day_items[i+1], dict) else day_items[i+1].start_time
-                    
-                    if next_item_start > current_item_end and (next_item_start - current_item_end).total_seconds() / 60 >= self.min_block_duration:
-                        free_blocks.append({
-                            'start_time': current_item_end,
-                            'end_time': next_item_start,
-                            'duration_minutes': (next_item_start - current_item_end).total_seconds() / 60
-                        })
-                
-                # Check for free time after last item
-                last_item_end = day_items[-1]['end_time'] if isinstance(day_items[-1], dict) else day_items[-1].end_time
-                if day_end > last_item_end and (day_end - last_item_end).total_seconds() / 60 >= self.min_block_duration:
-                    free_blocks.append({
-                        'start_time': last_item_end,
-                        'end_time': day_end,
-                        'duration_minutes': (day_end - last_item_end).total_seconds() / 60
-                    })
-            
-            # Move to next day
-            current_date += datetime.timedelta(days=1)
+                free_blocks = compute_free_blocks(intervals, self.window, self.preferences)
+            phase.count = len(free_blocks)
         
+        if free_blocks_key is not None:
+            self.cache.put(free_blocks_key, [(block.start, block.end) for block in free_blocks])
         return free_blocks
     
+    def _fixed_intervals(self):
+        """Busy (start, end) epoch-minute intervals of the fixed schedule, from the cache if possible."""
+        key = None
+        if self.cache is not None:
+            key = (self.user_id, self.schedule_version, 'busy', self.start_date, self.end_date)
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._phase('free_busy_cache') as phase:
+                    phase.count = len(cached)
+                return list(cached)
+        
+        items = self._load_fixed_items()
+        with self._phase('expand') as phase:
+            intervals = [(occurrence.start, occurrence.end) for occurrence in self._expand_fixed_items(items)]
+            phase.count = len(intervals)
+        
+        if key is not None:
+            intervals = merge_intervals(intervals)
+            self.cache.put(key, intervals)
+        return intervals
+    
+    def get_availability(self, busy_intervals=(), resolution=1):
+        """
+        Build a free/busy bitmap of the date range.
+        
+        Args:
+            busy_intervals: Additional (start_time, end_time) pairs to mark busy
+            resolution: Minutes per bitmap slot
+        
+        Returns:
+            AvailabilityBitmap with the fixed schedule painted on
+        """
+        availability = AvailabilityBitmap(self.window, self.preferences, resolution)
+        availability.paint_busy(self._fixed_intervals())
+        availability.paint_busy([(to_epoch_minutes(start_time), to_epoch_minutes(end_time))
+                                 for start_time, end_time in busy_intervals])
+        return availability
+    
     def get_pending_tasks(self):
         """Get all pending tasks for the user."""
-        return Task.query.filter_by(user_id=self.user_id, status='pending').all()
+        if self.pending_tasks is not None:
+            return list(self.pending_tasks)
+        with self._phase('load_tasks') as phase:
+            tasks = Task.query.filter_by(user_id=self.user_id, status='pending').all()
+            phase.count = len(tasks)
+        return tasks
+    
+    def get_tasks_to_plan(self, replace_existing=False):
+        """
+        Load the tasks generate_schedule plans, so previews can plan the same.
+        
+        Without replace_existing only the pending tasks are planned. With it
+        the user's existing blocks are discarded, so the tasks they held are
+        planned again.
+        
+        Args:
+            replace_existing: Plan as if the existing blocks were deleted
+        
+        Returns:
+            List of Task objects
+        """
+        if not replace_existing:
+            return self.get_pending_tasks()
+        with self._phase('load_tasks') as phase:
+            tasks = Task.query.filter(Task.user_id == self.user_id,
+                                      Task.status.in_(('pending', 'scheduled'))).all()
+            phase.count = len(tasks)
+        return tasks
+    
+    def get_task_dependencies(self):
+        """
+        Get all dependency edges between the user's tasks with a single query.
+        
+        Returns:
+            List of (prerequisite_id, dependent_id) pairs
+        """
+        if self.dependencies is not None:
+            return list(self.dependencies)
+        with self._phase('load_dependencies') as phase:
+            rows = db.session.query(TaskDependency.task_id, TaskDependency.dependent_task_id).join(
+                Task, Task.id == TaskDependency.dependent_task_id
+            ).filter(Task.user_id == self.user_id)
+            dependencies = [(prerequisite_id, dependent_id) for prerequisite_id, dependent_id in rows]
+            phase.count = len(dependencies)
+        return dependencies
+    
+    def get_prerequisite_ends(self, task_ids):
+        """
+        Find when prerequisites outside the plan will be done.
+        
+        Args:
+            task_ids: IDs of prerequisite tasks that are not being planned
+        
+        Returns:
+            Dict of task ID to the epoch minute its last scheduled block ends,
+            or None for unfinished tasks without a block; completed tasks and
+            tasks in progress are left out as they don't hold anything up
+        """
+        if not task_ids:
+            return {}
+        with self._phase('load_prerequisites') as phase:
+            ends = load_prerequisite_ends(task_ids)
+            phase.count = len(ends)
+        return ends
     
     def calculate_task_score(self, task, time_block, current_time):
         """
@@ -206,135 +304,297 @@ class IntelligentScheduler:
         
         Args:
             task: Task object
-            time_block: Dictionary with start_time and end_time
+            time_block: FreeBlock
             current_time: Current datetime for deadline calculations
         
         Returns:
             Score value (higher is better)
         """
-        # Base score
-        score = 0
-        
-        # Factor 1: Does the task fit in the time block?
-        if task.estimated_duration <= time_block['duration_minutes']:
-            score += 100  # Base score for fitting
-        else:
-            return -1  # Task doesn't fit, return negative score
-        
-        # Factor 2: Priority bonus (0-40 points)
-        score += (task.priority - 1) * 10  # 0-40 points based on priority (1-5)
-        
-        # Factor 3: Deadline proximity (0-30 points)
-        if task.deadline:
-            time_until_deadline = (task.deadline - current_time).total_seconds() / 3600  # hours
-            if time_until_deadline <= 0:
-                # Overdue tasks get maximum urgency
-                score += 30
-            elif time_until_deadline <= 24:
-                # Due within 24 hours
-                score += 25
-            elif time_until_deadline <= 72:
-                # Due within 3 days
-                score += 20
-            elif time_until_deadline <= 168:
-                # Due within a week
-                score += 15
-            else:
-                # Due later
-                score += 5
-        
-        # Factor 4: Block utilization (0-20 points)
-        # Prefer blocks that the task fills more completely
-        utilization = task.estimated_duration / time_block['duration_minutes']
-        score += utilization * 20
-        
-        # Factor 5: Time of day preference (0-10 points)
-        # This would ideally come from user preferences or learning
-        # For now, use a simple heuristic based on time of day
-        hour = time_block['start_time'].hour
-        if 9 <= hour <= 12:
-            # Morning (9 AM - 12 PM): good for focused work
-            score += 10
-        elif 13 <= hour <= 16:
-            # Afternoon (1 PM - 4 PM): good for collaborative work
-            score += 8
-        elif 17 <= hour <= 19:
-            # Evening (5 PM - 7 PM): good for lighter tasks
-            score += 6
-        else:
-            # Early morning or late evening: less preferred
-            score += 3
-        
-        return score
-    
-    def generate_schedule(self):
+        return task_score(task, time_block, current_time)
+    
+    def calculate_score_matrix(self, tasks, time_blocks, current_time):
         """
-        Generate an optimal schedule for pending tasks.
+        Calculate the scores of every task in every time block at once.
+        
+        Args:
+            tasks: List of Task objects
+            time_blocks: List of FreeBlock objects
+            current_time: Current datetime for deadline calculations
         
         Returns:
-            List of scheduled blocks
+            NumPy array of shape (len(tasks), len(time_blocks)), -1 where a task doesn't fit
         """
-        # Get free time blocks
-        free_blocks = self.get_free_time_blocks()
+        return score_matrix(tasks, time_blocks, current_time)
+    
+    def plan(self, tasks=None, busy_intervals=(), prerequisite_ends=None):
+        """
+        Plan tasks into free time without touching the database.
         
-        # Get pending tasks
-        pending_tasks = self.get_pending_tasks()
+        Tasks are placed after the tasks they depend on; prerequisites that
+        aren't being planned are looked up unless prerequisite_ends is given.
         
-        # Sort tasks by priority and deadline
-        pending_tasks.sort(key=lambda t: (
-            -t.priority,  # Higher priority first
-            t.deadline or datetime.datetime.max  # Earlier deadline first
-        ))
+        Args:
+            tasks: Task objects to place (defaults to the pending tasks)
+            busy_intervals: Additional (start_time, end_time) pairs to keep clear
+            prerequisite_ends: Optional {task_id: epoch minute or None} for
+                prerequisites outside the plan, see get_prerequisite_ends
         
-        # Current time for deadline calculations
-        current_time = datetime.datetime.now()
+        Returns:
+            List of Placement objects
+        """
+        if tasks is None:
+            tasks = self.get_pending_tasks()
+        task_specs = [
+            TaskSpec(task.id, task.estimated_duration, task.priority, task.deadline)
+            for task in tasks
+        ]
+        dependencies = self.get_task_dependencies()
+        if prerequisite_ends is None and dependencies:
+            planned_ids = {task.id for task in task_specs}
+            prerequisite_ends = self.get_prerequisite_ends({
+                prerequisite_id for prerequisite_id, dependent_id in dependencies
+                if dependent_id in planned_ids and prerequisite_id not in planned_ids
+            })
+        free_blocks = self.get_free_time_blocks(busy_intervals)
+        with self._phase('assignment') as phase:
+            placements = plan_schedule(task_specs, free_blocks, self.preferences, datetime.datetime.now(),
+                                       dependencies, prerequisite_ends)
+            phase.count = len(placements)
+        return placements
+    
+    def save_plan(self, placements, replace_existing=False):
+        """
+        Write placements as suggested blocks and mark their tasks scheduled.
+        
+        Uses bulk statements in the current transaction; see save_plans.
+        
+        Args:
+            placements: Placement objects returned by plan()
+            replace_existing: Delete the user's existing blocks first
+        """
+        save_plans({self.user_id: placements}, replace_existing)
+    
+    def reschedule(self, change):
+        """
+        Repair the existing plan after a single change instead of regenerating it.
+        
+        Only the suggested blocks affected by the change are released; their
+        tasks (and a new or edited task) are re-placed into the time left
+        free by the fixed schedule and the placements that are kept, along
+        with every task that depends on them, directly or not, so nothing
+        ends up before a prerequisite that moved. When a fixed item is
+        deleted, pending tasks that didn't fit before are offered the freed
+        time. Untouched placements stay in the database as they are.
+        
+        Args:
+            change: ScheduleChange describing what was edited
+        
+        Returns:
+            List of Placement objects for the newly scheduled blocks
+        """
+        if change.kind in (ScheduleChange.ITEM_ADDED, ScheduleChange.ITEM_UPDATED, ScheduleChange.ITEM_DELETED):
+            # The edit bumped the schedule version, read it again
+            self._schedule_version = None
+        
+        existing_blocks = ScheduledBlock.query.filter_by(user_id=self.user_id).all()
+        released_blocks = self._affected_blocks(change, existing_blocks)
+        released_ids = {block.id for block in released_blocks}
+        
+        # Tasks that come after a moved task have to move with it
+        moved_ids = {block.task_id for block in released_blocks}
+        if change.kind in (ScheduleChange.TASK_ADDED, ScheduleChange.TASK_UPDATED):
+            moved_ids.add(change.task_id)
+        elif change.kind in (ScheduleChange.TASK_DELETED, ScheduleChange.TASK_COMPLETED):
+            moved_ids.discard(change.task_id)
+        dependent_ids = self._dependents_of(moved_ids)
+        for block in existing_blocks:
+            if block.task_id in dependent_ids and block.status == 'suggested' and block.id not in released_ids:
+                released_blocks.append(block)
+                released_ids.add(block.id)
+        kept_blocks = [block for block in existing_blocks if block.id not in released_ids]
+        
+        # Work out which tasks need a (new) place in the plan
+        task_ids = {block.task_id for block in released_blocks}
+        if change.kind in (ScheduleChange.TASK_ADDED, ScheduleChange.TASK_UPDATED):
+            task_ids.add(change.task_id)
+        elif change.kind in (ScheduleChange.TASK_DELETED, ScheduleChange.TASK_COMPLETED):
+            task_ids.discard(change.task_id)
+        task_ids -= {block.task_id for block in kept_blocks}
+        
+        tasks = []
+        if task_ids:
+            tasks = Task.query.filter(Task.user_id == self.user_id, Task.id.in_(task_ids)).all()
+            tasks = [task for task in tasks if task.status in ('pending', 'scheduled')]
+        if change.kind == ScheduleChange.ITEM_DELETED:
+            # Time was freed up, give tasks that didn't fit before another chance
+            tasks.extend(task for task in self.get_pending_tasks() if task.id not in task_ids)
+        
+        block_table = ScheduledBlock.__table__
+        if released_ids:
+            db.session.execute(block_table.delete().where(block_table.c.id.in_(released_ids)))
+        for task in tasks:
+            task.status = 'pending'
         
-        # Schedule tasks
-        scheduled_blocks = []
+        placements = []
+        if tasks:
+            placements = self.plan(tasks, [(block.start_time, block.end_time) for block in kept_blocks])
         
-        for task in pending_tasks:
-            # Find best time block for this task
-            best_block = None
-            best_score = -1
+        with self._phase('persist') as phase:
+            self.save_plan(placements)
+            db.session.commit()
+            phase.count = len(placements)
+        
+        return placements
+    
+    def _dependents_of(self, task_ids):
+        """IDs of the tasks that depend on any of the given tasks, directly or transitively."""
+        if not task_ids:
+            return set()
+        dependents = defaultdict(list)
+        for prerequisite_id, dependent_id in self.get_task_dependencies():
+            dependents[prerequisite_id].append(dependent_id)
+        
+        found = set()
+        stack = list(task_ids)
+        while stack:
+            for dependent_id in dependents[stack.pop()]:
+                if dependent_id not in found:
+                    found.add(dependent_id)
+                    stack.append(dependent_id)
+        return found
+    
+    def _affected_blocks(self, change, existing_blocks):
+        """Find the existing blocks a change invalidates."""
+        if change.kind == ScheduleChange.TASK_DELETED:
+            # Blocks can't outlive their task
+            return [block for block in existing_blocks if block.task_id == change.task_id]
+        
+        suggested = [block for block in existing_blocks if block.status == 'suggested']
+        
+        if change.kind in (ScheduleChange.TASK_UPDATED, ScheduleChange.TASK_COMPLETED):
+            return [block for block in suggested if block.task_id == change.task_id]
+        
+        if change.kind in (ScheduleChange.ITEM_ADDED, ScheduleChange.ITEM_UPDATED) and suggested:
+            item = FixedScheduleItem.query.filter_by(id=change.item_id, user_id=self.user_id).first()
+            if item is None:
+                return []
             
-            for block in free_blocks:
-                score = self.calculate_task_score(task, block, current_time)
-                if score > best_score:
-                    best_score = score
-                    best_block = block
+            # Expand the item only over the span covered by the plan
+            occurrences = merge_intervals(iter_occurrences(
+                item,
+                min(block.start_time for block in suggested).date(),
+                max(block.end_time for block in suggested).date()
+            ))
+            occurrence_starts = [start for start, _ in occurrences]
             
-            if best_block:
-                # Schedule the task in this block
-                scheduled_block = ScheduledBlock(
-                    user_id=self.user_id,
-                    task_id=task.id,
-                    start_time=best_block['start_time'],
-                    end_time=best_block['start_time'] + datetime.timedelta(minutes=task.estimated_duration),
-                    status='suggested'
-                )
-                
-                # Update the free block
-                remaining_minutes = best_block['duration_minutes'] - task.estimated_duration
-                if remaining_minutes >= self.min_block_duration:
-                    # Block still has usable time, update it
-                    best_block['start_time'] = scheduled_block.end_time
-                    best_block['duration_minutes'] = remaining_minutes
-                else:
-                    # Block is now too small, remove it
-                    free_blocks.remove(best_block)
-                
-                scheduled_blocks.append(scheduled_block)
-                
-                # Update task status
-                task.status = 'scheduled'
+            affected = []
+            for block in suggested:
+                # Last occurrence starting before the block ends
+                index = bisect.bisect_left(occurrence_starts, block.end_time) - 1
+                if index >= 0 and occurrences[index][1] > block.start_time:
+                    affected.append(block)
+            return affected
         
-        # Save to database
-        for block in scheduled_blocks:
-            db.session.add(block)
+        # New tasks and deleted fixed items only free up or add work
+        return []
+    
+    def generate_schedule(self, replace_existing=False):
+        """
+        Generate an optimal schedule for pending tasks.
+        
+        Args:
+            replace_existing: Delete the user's existing blocks in the same
+                transaction and plan the tasks they held again
         
-        db.session.commit()
+        Returns:
+            List of Placement objects for the scheduled blocks
+        """
+        placements = self.plan(self.get_tasks_to_plan(replace_existing))
         
-        return scheduled_blocks
+        # Save to database
+        with self._phase('persist') as phase:
+            self.save_plan(placements, replace_existing)
+            db.session.commit()
+            phase.count = len(placements)
+        
+        return placements
+
+def load_prerequisite_ends(task_ids):
+    """
+    Find when prerequisite tasks will be done, with a single query.
+    
+    Args:
+        task_ids: IDs of prerequisite tasks, of any number of users
+    
+    Returns:
+        Dict of task ID to the epoch minute its last scheduled block ends,
+        or None for unfinished tasks without a block; completed tasks and
+        tasks in progress without a block are left out
+    """
+    if not task_ids:
+        return {}
+    rows = db.session.query(Task.id, Task.status, func.max(ScheduledBlock.end_time)).outerjoin(
+        ScheduledBlock, ScheduledBlock.task_id == Task.id
+    ).filter(Task.id.in_(task_ids), Task.status != 'completed').group_by(Task.id, Task.status)
+    
+    ends = {}
+    for task_id, status, last_end in rows:
+        if last_end is not None:
+            ends[task_id] = to_epoch_minutes(last_end)
+        elif status in ('pending', 'scheduled'):
+            ends[task_id] = None
+    return ends
+
+# Task IDs per UPDATE statement, below SQLite's bound parameter limit
+_UPDATE_BATCH_SIZE = 500
+
+def save_plans(plans, replace_existing=False):
+    """
+    Write the plans of one or more users with bulk statements.
+    
+    Blocks are inserted with a single executemany and task statuses are
+    flipped with UPDATE ... WHERE id IN (...), so no ORM objects are built
+    or tracked. Nothing is committed; the caller owns the transaction.
+    
+    Args:
+        plans: Dict of user ID to a list of Placement objects
+        replace_existing: Delete the users' existing blocks first; their
+            scheduled tasks go back to pending unless placed again
+    """
+    block_table = ScheduledBlock.__table__
+    task_table = Task.__table__
+    
+    if replace_existing and plans:
+        user_ids = list(plans)
+        db.session.execute(block_table.delete().where(block_table.c.user_id.in_(user_ids)))
+        db.session.execute(
+            task_table.update()
+            .where(task_table.c.user_id.in_(user_ids), task_table.c.status == 'scheduled')
+            .values(status='pending')
+        )
+    
+    rows = [
+        {
+            'user_id': user_id,
+            'task_id': placement.task_id,
+            'start_time': placement.start_time,
+            'end_time': placement.end_time,
+            'status': 'suggested'
+        }
+        for user_id, placements in plans.items()
+        for placement in placements
+    ]
+    if not rows:
+        return
+    db.session.execute(block_table.insert(), rows)
+    
+    task_ids = sorted({row['task_id'] for row in rows})
+    for i in range(0, len(task_ids), _UPDATE_BATCH_SIZE):
+        db.session.execute(
+            task_table.update()
+            .where(task_table.c.id.in_(task_ids[i:i + _UPDATE_BATCH_SIZE]))
+            .values(status='scheduled')
+        )
 
 def schedule_tasks_for_user(user_id, start_date=None, end_date=None):
     """
@@ -346,7 +606,42 @@ def schedule_tasks_for_user(user_id, start_date=None, end_date=None):
         end_date: End date for scheduling (defaults to 7 days from start)
     
     Returns:
-        List of scheduled blocks
+        List of Placement objects for the scheduled blocks
     """
     scheduler = IntelligentScheduler(user_id, start_date, end_date)
     return scheduler.generate_schedule()
+
+def replace_schedule_for_user(user_id, start_date=None, end_date=None):
+    """
+    Discard a user's scheduled blocks and plan their pending tasks afresh.
+    
+    The old blocks are removed in the same transaction that saves the new
+    ones, so the user never sees an empty schedule in between.
+    
+    Args:
+        user_id: User ID
+        start_date: Start date for scheduling (defaults to today)
+        end_date: End date for scheduling (defaults to 7 days from start)
+    
+    Returns:
+        List of Placement objects for the scheduled blocks
+    """
+    scheduler = IntelligentScheduler(user_id, start_date, end_date)
+    return scheduler.generate_schedule(replace_existing=True)
+
+def reschedule_for_user(user_id, change):
+    """
+    Repair a user's plan after a change to their tasks or fixed schedule.
+    
+    Users without a plan are left alone; they get one when they generate it.
+    
+    Args:
+        user_id: User ID
+        change: ScheduleChange describing what was edited
+    
+    Returns:
+        List of Placement objects for the newly scheduled blocks
+    """
+    if ScheduledBlock.query.filter_by(user_id=user_id).first() is None:
+        return []
+    return IntelligentScheduler(user_id).reschedule(change)
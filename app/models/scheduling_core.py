@@ -0,0 +1,607 @@
+"""
+Pure scheduling core.
+
+Everything in this module works on plain value objects and has no
+knowledge of the database or Flask, so it can be called for dry runs,
+benchmarks and batch jobs. IntelligentScheduler in app.models.scheduler
+loads the inputs from the database and persists the resulting placements.
+"""
+import bisect
+import datetime
+import heapq
+import math
+from collections import defaultdict, namedtuple
+import numpy as np
+
+# A pending task, as far as the scheduler is concerned
+TaskSpec = namedtuple('TaskSpec', ['id', 'estimated_duration', 'priority', 'deadline'])
+
+# A user's scheduling preferences
+SchedulingPreferences = namedtuple('SchedulingPreferences', ['start_day_time', 'end_day_time', 'min_block_duration'])
+
+# Inclusive date range to schedule over
+SchedulingWindow = namedtuple('SchedulingWindow', ['start_date', 'end_date'])
+
+DEFAULT_PREFERENCES = SchedulingPreferences(datetime.time(8, 0), datetime.time(22, 0), 15)
+
+# Times inside the core are whole minutes since this (naive) epoch
+EPOCH = datetime.datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+_EPOCH_ORDINAL = EPOCH.toordinal()
+_ONE_MINUTE = datetime.timedelta(minutes=1)
+
+def to_epoch_minutes(value):
+    """Convert a naive datetime to minutes since the epoch (seconds are dropped)."""
+    return (value - EPOCH) // _ONE_MINUTE
+
+def from_epoch_minutes(minutes):
+    """Convert minutes since the epoch back to a naive datetime."""
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+def date_to_epoch_minutes(value):
+    """Minutes since the epoch at midnight of a date."""
+    return (value.toordinal() - _EPOCH_ORDINAL) * MINUTES_PER_DAY
+
+def time_to_minutes(value):
+    """Minutes since midnight of a time of day."""
+    return value.hour * 60 + value.minute
+
+class _MinuteInterval:
+    """Base for compact [start, end) intervals stored as epoch minutes."""
+    
+    __slots__ = ('start', 'end')
+    
+    @property
+    def start_time(self):
+        return from_epoch_minutes(self.start)
+    
+    @property
+    def end_time(self):
+        return from_epoch_minutes(self.end)
+    
+    @property
+    def duration_minutes(self):
+        return self.end - self.start
+    
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.start_time:%Y-%m-%d %H:%M}-{self.end_time:%H:%M}>'
+
+class FixedOccurrence(_MinuteInterval):
+    """One occurrence of a fixed schedule item."""
+    
+    __slots__ = ('item_id',)
+    
+    def __init__(self, item_id, start, end):
+        self.item_id = item_id
+        self.start = start
+        self.end = end
+
+class FreeBlock(_MinuteInterval):
+    """A free time block; its start moves forward as tasks are placed in it."""
+    
+    __slots__ = ()
+    
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+class Placement(_MinuteInterval):
+    """A task placed into a free block."""
+    
+    __slots__ = ('task_id',)
+    
+    def __init__(self, task_id, start, end):
+        self.task_id = task_id
+        self.start = start
+        self.end = end
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or touching (start, end) intervals.
+    
+    Args:
+        intervals: Iterable of (start, end) pairs in any order
+    
+    Returns:
+        Sorted list of disjoint (start, end) pairs
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def _time_of_day_score(start):
+    """Time of day preference score (0-10 points) for a block starting at the given epoch minute."""
+    hour = start // 60 % 24
+    if 9 <= hour <= 12:
+        # Morning (9 AM - 12 PM): good for focused work
+        return 10
+    elif 13 <= hour <= 16:
+        # Afternoon (1 PM - 4 PM): good for collaborative work
+        return 8
+    elif 17 <= hour <= 19:
+        # Evening (5 PM - 7 PM): good for lighter tasks
+        return 6
+    # Early morning or late evening: less preferred
+    return 3
+
+def _deadline_score(task, current_time):
+    """Deadline proximity score (0-30 points) for a task."""
+    if not task.deadline:
+        return 0
+    time_until_deadline = (task.deadline - current_time).total_seconds() / 3600  # hours
+    if time_until_deadline <= 0:
+        # Overdue tasks get maximum urgency
+        return 30
+    elif time_until_deadline <= 24:
+        # Due within 24 hours
+        return 25
+    elif time_until_deadline <= 72:
+        # Due within 3 days
+        return 20
+    elif time_until_deadline <= 168:
+        # Due within a week
+        return 15
+    # Due later
+    return 5
+
+def _task_base_score(task, current_time):
+    """Block-independent part of a task's score: fit bonus, priority and deadline."""
+    return 100 + (task.priority - 1) * 10 + _deadline_score(task, current_time)
+
+def _task_score_arrays(tasks, current_time):
+    """
+    Build the per-task inputs of the score matrix.
+    
+    Returns:
+        Tuple of (durations, base_scores) arrays where base_scores holds the
+        block-independent part of the score: fit bonus, priority and deadline
+    """
+    durations = np.array([task.estimated_duration for task in tasks], dtype=float)
+    base_scores = np.array([_task_base_score(task, current_time) for task in tasks], dtype=float)
+    return durations, base_scores
+
+def _block_score_arrays(time_blocks):
+    """
+    Build the per-block inputs of the score matrix.
+    
+    Returns:
+        Tuple of (durations, hour_scores) arrays
+    """
+    count = len(time_blocks)
+    durations = np.fromiter((block.end - block.start for block in time_blocks), dtype=float, count=count)
+    # Same rule as task_score and the block pool, evaluated once per block
+    hour_scores = np.fromiter((_time_of_day_score(block.start) for block in time_blocks), dtype=float, count=count)
+    return durations, hour_scores
+
+def _score_matrix(task_durations, task_base_scores, block_durations, block_hour_scores):
+    """Combine task and block arrays into a (tasks x blocks) score matrix."""
+    fits = task_durations[:, None] <= block_durations[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = task_durations[:, None] / block_durations[None, :]
+    # Same summation order as task_score so scores match exactly
+    scores = task_base_scores[:, None] + utilization * 20 + block_hour_scores[None, :]
+    return np.where(fits, scores, -1.0)
+
+class _DurationIndex:
+    """
+    Positions of the free blocks in one time-of-day bucket, grouped by
+    remaining duration.
+    
+    Block durations are bounded (a block never outlasts a day's window), so
+    a max-tree over the durations holds the latest position available at
+    each duration. Finding the shortest block that is long enough and
+    starts at or after a given position is then one walk down the tree.
+    """
+    
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity: One more than the longest block duration to index
+        """
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.positions = {}
+        self.tree = [-1] * (2 * self.size)
+    
+    def add(self, duration, position):
+        positions = self.positions.setdefault(duration, [])
+        bisect.insort(positions, position)
+        self._update(duration, positions[-1])
+    
+    def remove(self, duration, position):
+        positions = self.positions[duration]
+        del positions[bisect.bisect_left(positions, position)]
+        self._update(duration, positions[-1] if positions else -1)
+    
+    def _update(self, duration, latest_position):
+        node = duration + self.size
+        self.tree[node] = latest_position
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+    
+    def find(self, duration, min_position=0):
+        """
+        Find the shortest block of at least the given duration at or after
+        a position.
+        
+        Returns:
+            Tuple of (block duration, position), lowest position first among
+            equally short blocks, or None if there is no such block
+        """
+        if duration >= self.size:
+            return None
+        node = max(duration, 0) + self.size
+        tree = self.tree
+        
+        # Move right through the tree until a subtree holds a late enough position
+        while tree[node] < min_position:
+            while node & 1:
+                node //= 2
+            if not node:
+                return None
+            node += 1
+        
+        # Descend to the leftmost (shortest) qualifying duration
+        while node < self.size:
+            node *= 2
+            if tree[node] < min_position:
+                node += 1
+        
+        block_duration = node - self.size
+        positions = self.positions[block_duration]
+        return block_duration, positions[bisect.bisect_left(positions, min_position)]
+
+class FreeBlockPool:
+    """
+    Pool of free time blocks indexed for best-fit lookups.
+    
+    Apart from the task itself, a block's score only depends on its
+    remaining duration (utilization) and on the time-of-day bucket of its
+    start hour. Within a bucket the best block for a task is therefore the
+    shortest block it fits in, so each bucket indexes its blocks by
+    duration and a lookup is a logarithmic search per bucket. Ties are
+    broken by position, which reproduces the first-best linear scan.
+    
+    Blocks are chronological and never overlap, so "starts no earlier than
+    a given time" is the same as "at or after some position"; lookups can
+    be restricted that way to place a task after its prerequisites.
+    """
+    
+    def __init__(self, blocks, min_block_duration):
+        """
+        Args:
+            blocks: Chronological list of FreeBlock objects
+            min_block_duration: Blocks shrinking below this are dropped
+        """
+        self.blocks = blocks
+        self.min_block_duration = min_block_duration
+        # Current block starts; they stay sorted as blocks shrink from the front
+        self.starts = [block.start for block in blocks]
+        self._capacity = max((block.end - block.start for block in blocks), default=0) + 1
+        self._buckets = {}
+        for position in range(len(blocks)):
+            self._insert(position)
+    
+    def _bucket(self, block):
+        hour_score = _time_of_day_score(block.start)
+        if hour_score not in self._buckets:
+            self._buckets[hour_score] = _DurationIndex(self._capacity)
+        return self._buckets[hour_score]
+    
+    def _insert(self, position):
+        block = self.blocks[position]
+        self._bucket(block).add(block.end - block.start, position)
+    
+    def _remove(self, position):
+        block = self.blocks[position]
+        self._bucket(block).remove(block.end - block.start, position)
+    
+    def best_fit(self, duration, base_score=0, earliest_start=None):
+        """
+        Find the best scoring block a task of the given duration fits in.
+        
+        Args:
+            duration: Task duration in minutes
+            base_score: Block-independent part of the task's score
+            earliest_start: Optional epoch minute; only blocks starting at or
+                after it are considered
+        
+        Returns:
+            Tuple of (score, position), or None if the task fits nowhere
+        """
+        min_position = 0
+        if earliest_start is not None:
+            min_position = bisect.bisect_left(self.starts, earliest_start)
+        
+        best = None
+        for hour_score, index in self._buckets.items():
+            found = index.find(math.ceil(duration), min_position)
+            if found is None:
+                continue
+            block_duration, position = found
+            # Same arithmetic as task_score so ties resolve identically
+            score = base_score + duration / block_duration * 20 + hour_score
+            if best is None or score > best[0] or (score == best[0] and position < best[1]):
+                best = (score, position)
+        return best
+    
+    def allocate(self, position, duration):
+        """
+        Place a task of the given duration at the start of a block.
+        
+        The block is shrunk, or dropped from the pool if the remaining time
+        is shorter than min_block_duration.
+        
+        Returns:
+            Tuple of (start, end) epoch minutes for the placement
+        """
+        block = self.blocks[position]
+        self._remove(position)
+        
+        start = block.start
+        end = start + duration
+        if block.end - end >= self.min_block_duration:
+            # Block still has usable time, update it
+            block.start = end
+            self.starts[position] = end
+            self._insert(position)
+        
+        return start, end
+
+def compute_free_blocks(busy_intervals, window, preferences):
+    """
+    Identify all free time blocks in a window around busy intervals.
+    
+    Busy intervals are merged into a sorted list of disjoint intervals
+    once, then a single sweep walks the days of the window alongside that
+    list, so the cost is O(n log n) in the number of intervals rather than
+    O(days * intervals).
+    
+    Args:
+        busy_intervals: Iterable of (start, end) epoch-minute pairs, such as
+            fixed occurrences and placements that are kept
+        window: SchedulingWindow to find free time in
+        preferences: SchedulingPreferences with the daily time window
+    
+    Returns:
+        Chronological list of FreeBlock objects
+    """
+    busy_intervals = merge_intervals(busy_intervals)
+    min_block_duration = preferences.min_block_duration
+    day_start_offset = time_to_minutes(preferences.start_day_time)
+    day_end_offset = time_to_minutes(preferences.end_day_time)
+    
+    free_blocks = []
+    next_busy = 0
+    current_day = date_to_epoch_minutes(window.start_date)
+    last_day = date_to_epoch_minutes(window.end_date)
+    
+    # Process each day in the date range
+    while current_day <= last_day:
+        # Start of day's available time
+        day_start = current_day + day_start_offset
+        day_end = current_day + day_end_offset
+        
+        # Skip busy intervals that finished before today's window opens
+        while next_busy < len(busy_intervals) and busy_intervals[next_busy][1] <= day_start:
+            next_busy += 1
+        
+        # Walk the busy intervals overlapping today's window
+        cursor = day_start
+        while next_busy < len(busy_intervals) and busy_intervals[next_busy][0] < day_end:
+            busy_start, busy_end = busy_intervals[next_busy]
+            if busy_start - cursor >= min_block_duration:
+                free_blocks.append(FreeBlock(cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if busy_end >= day_end:
+                # Runs past today's window, may still block tomorrow
+                break
+            next_busy += 1
+        
+        # Check for free time after the last busy interval
+        if day_end - cursor >= min_block_duration:
+            free_blocks.append(FreeBlock(cursor, day_end))
+        
+        # Move to next day
+        current_day += MINUTES_PER_DAY
+    
+    return free_blocks
+
+def task_score(task, time_block, current_time):
+    """
+    Calculate a score for scheduling a task in a specific time block.
+    Higher score means better fit.
+    
+    Args:
+        task: TaskSpec (or Task) with estimated_duration, priority and deadline
+        time_block: FreeBlock
+        current_time: Current datetime for deadline calculations
+    
+    Returns:
+        Score value (higher is better)
+    """
+    # Base score
+    score = 0
+    
+    # Factor 1: Does the task fit in the time block?
+    block_duration = time_block.end - time_block.start
+    if task.estimated_duration <= block_duration:
+        score += 100  # Base score for fitting
+    else:
+        return -1  # Task doesn't fit, return negative score
+    
+    # Factor 2: Priority bonus (0-40 points)
+    score += (task.priority - 1) * 10  # 0-40 points based on priority (1-5)
+    
+    # Factor 3: Deadline proximity (0-30 points)
+    score += _deadline_score(task, current_time)
+    
+    # Factor 4: Block utilization (0-20 points)
+    # Prefer blocks that the task fills more completely
+    utilization = task.estimated_duration / block_duration
+    score += utilization * 20
+    
+    # Factor 5: Time of day preference (0-10 points)
+    # This would ideally come from user preferences or learning
+    # For now, use a simple heuristic based on time of day
+    score += _time_of_day_score(time_block.start)
+    
+    return score
+
+def score_matrix(tasks, time_blocks, current_time):
+    """
+    Calculate the scores of every task in every time block at once.
+    
+    Vectorized equivalent of calling task_score for each (task, block)
+    pair; entries where the task doesn't fit are -1. This is the batched
+    path for callers that rank every pair at once. plan_schedule scores
+    one task at a time through FreeBlockPool.best_fit instead, as blocks
+    shrink while tasks are placed; both are built from _task_base_score
+    and _time_of_day_score.
+    
+    Args:
+        tasks: List of TaskSpec (or Task) objects
+        time_blocks: List of FreeBlock objects
+        current_time: Current datetime for deadline calculations
+    
+    Returns:
+        NumPy array of shape (len(tasks), len(time_blocks))
+    """
+    task_durations, task_base_scores = _task_score_arrays(tasks, current_time)
+    block_durations, block_hour_scores = _block_score_arrays(time_blocks)
+    return _score_matrix(task_durations, task_base_scores, block_durations, block_hour_scores)
+
+def _task_sort_key(task):
+    """Order tasks by priority and deadline."""
+    return (
+        -task.priority,  # Higher priority first
+        task.deadline or datetime.datetime.max  # Earlier deadline first
+    )
+
+def order_tasks(tasks, dependencies=()):
+    """
+    Order tasks so that every prerequisite comes before its dependents.
+    
+    Kahn's algorithm, with a heap picking the most important ready task
+    first. A prerequisite inherits the importance of the most important
+    task waiting on it, so a high priority task isn't held back behind a
+    low priority prerequisite. Without dependencies this is the plain
+    priority/deadline order.
+    
+    Args:
+        tasks: List of TaskSpec (or Task) objects
+        dependencies: Iterable of (prerequisite_id, dependent_id) pairs, as
+            stored in TaskDependency (task_id, dependent_task_id); pairs
+            involving other tasks are ignored
+    
+    Returns:
+        Tuple of (ordered tasks, blocked tasks) where blocked tasks are part
+        of, or depend on, a dependency cycle and can't be ordered
+    """
+    tasks = sorted(tasks, key=_task_sort_key)
+    rank = {task.id: index for index, task in enumerate(tasks)}
+    successors = defaultdict(list)
+    in_degree = dict.fromkeys(rank, 0)
+    for prerequisite_id, dependent_id in dependencies:
+        if prerequisite_id in rank and dependent_id in rank:
+            successors[prerequisite_id].append(dependent_id)
+            in_degree[dependent_id] += 1
+    
+    if not successors:
+        return tasks, []
+    
+    # First pass: any topological order, to propagate importance backwards
+    remaining = dict(in_degree)
+    topological = [task_id for task_id, degree in remaining.items() if degree == 0]
+    for task_id in topological:
+        for dependent_id in successors[task_id]:
+            remaining[dependent_id] -= 1
+            if remaining[dependent_id] == 0:
+                topological.append(dependent_id)
+    
+    urgency = dict(rank)
+    for task_id in reversed(topological):
+        for dependent_id in successors[task_id]:
+            urgency[task_id] = min(urgency[task_id], urgency[dependent_id])
+    
+    # Second pass: most urgent ready task first
+    ready = [(urgency[task_id], rank[task_id]) for task_id in topological if in_degree[task_id] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _, task_rank = heapq.heappop(ready)
+        task = tasks[task_rank]
+        ordered.append(task)
+        for dependent_id in successors[task.id]:
+            in_degree[dependent_id] -= 1
+            if in_degree[dependent_id] == 0:
+                heapq.heappush(ready, (urgency[dependent_id], rank[dependent_id]))
+    
+    blocked = [task for task in tasks if in_degree[task.id] > 0]
+    return ordered, blocked
+
+def plan_schedule(tasks, free_blocks, preferences, current_time, dependencies=(), prerequisite_ends=None):
+    """
+    Greedily place tasks into free blocks, most important tasks first.
+    
+    A task with prerequisites is only placed in blocks starting after all of
+    its prerequisites end; if a prerequisite can't be placed, neither can
+    the task. Tasks caught in a dependency cycle are left unplaced.
+    
+    Args:
+        tasks: List of TaskSpec (or Task) objects to place
+        free_blocks: Chronological list of FreeBlock objects (consumed)
+        preferences: SchedulingPreferences; blocks shrinking below its
+            min_block_duration are dropped
+        current_time: Current datetime for deadline calculations
+        dependencies: Iterable of (prerequisite_id, dependent_id) pairs
+        prerequisite_ends: Optional {task_id: epoch minute} for prerequisites
+            that are not part of this plan, with None for ones that won't be
+            done by any time; other outside prerequisites count as done
+    
+    Returns:
+        List of Placement objects, in placement order
+    """
+    dependencies = list(dependencies)
+    ends = dict(prerequisite_ends or {})
+    
+    # Order tasks by priority and deadline, prerequisites first
+    tasks, _ = order_tasks(tasks, dependencies)
+    
+    prerequisites = defaultdict(list)
+    planned_ids = {task.id for task in tasks}
+    for prerequisite_id, dependent_id in dependencies:
+        if dependent_id in planned_ids and (prerequisite_id in planned_ids or prerequisite_id in ends):
+            prerequisites[dependent_id].append(prerequisite_id)
+    
+    # Index the free blocks for best-fit lookups
+    pool = FreeBlockPool(free_blocks, preferences.min_block_duration)
+    
+    placements = []
+    for task in tasks:
+        earliest_start = None
+        for prerequisite_id in prerequisites.get(task.id, ()):
+            # Prerequisites are ordered first, so a missing end means unplaced
+            prerequisite_end = ends.get(prerequisite_id)
+            if prerequisite_end is None:
+                break
+            if earliest_start is None or prerequisite_end > earliest_start:
+                earliest_start = prerequisite_end
+        else:
+            # Find best time block for this task
+            best = pool.best_fit(task.estimated_duration, _task_base_score(task, current_time), earliest_start)
+            if best is not None:
+                # Schedule the task in this block
+                start, end = pool.allocate(best[1], task.estimated_duration)
+                placements.append(Placement(task.id, start, end))
+                ends[task.id] = end
+    
+    return placements
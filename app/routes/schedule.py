@@ -2,8 +2,12 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app.models.forms import FixedScheduleItemForm
 from app.models.models import FixedScheduleItem
+from app.models.recurrence import iter_occurrences
+from app.models.scheduler import ScheduleChange
+from app.models.schedule_cache import bump_schedule_version
+from app.jobs import get_job_queue
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
 
 schedule = Blueprint('schedule', __name__)
 
@@ -50,7 +54,12 @@ def new_schedule_item():
             color=form.color.data
         )
         db.session.add(schedule_item)
+        bump_schedule_version(current_user.id)
         db.session.commit()
+        
+        # Move planned tasks out of the way of the new item
+        get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.ITEM_ADDED, item_id=schedule_item.id))
+        
         flash('Schedule item added successfully!', 'success')
         return redirect(url_for('schedule.index'))
     return render_template('schedule/new.html', form=form)
@@ -77,7 +86,12 @@ def edit_schedule_item(id):
         schedule_item.category = form.category.data
         schedule_item.color = form.color.data
         
+        bump_schedule_version(current_user.id)
         db.session.commit()
+        
+        # Move planned tasks out of the way of the edited item
+        get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.ITEM_UPDATED, item_id=schedule_item.id))
+        
         flash('Schedule item updated successfully!', 'success')
         return redirect(url_for('schedule.index'))
     
@@ -94,15 +108,58 @@ def delete_schedule_item(id):
         return redirect(url_for('schedule.index'))
     
     db.session.delete(schedule_item)
+    bump_schedule_version(current_user.id)
     db.session.commit()
+    
+    # Offer the freed time to tasks that didn't fit before
+    get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.ITEM_DELETED, item_id=id))
+    
     flash('Schedule item deleted successfully!', 'success')
     return redirect(url_for('schedule.index'))
 
+def _parse_range_param(value):
+    """Parse a FullCalendar range parameter (ISO date or datetime) into a datetime."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
 @schedule.route('/api/items', methods=['GET'])
 @login_required
 def get_schedule_items():
-    """API endpoint to get all schedule items for the current user"""
+    """
+    API endpoint to get all schedule items for the current user.
+    
+    When FullCalendar passes a visible range via the start and end query
+    parameters, recurring items are expanded server-side into concrete
+    events for that range only.
+    """
     schedule_items = FixedScheduleItem.query.filter_by(user_id=current_user.id).all()
+    
+    range_start = _parse_range_param(request.args.get('start'))
+    range_end = _parse_range_param(request.args.get('end'))
+    if range_start and range_end:
+        # The end of the range is exclusive
+        start_date = range_start.date()
+        end_date = (range_end - timedelta(microseconds=1)).date()
+        items = []
+        for item in schedule_items:
+            for start_time, end_time in iter_occurrences(item, start_date, end_date):
+                items.append({
+                    'id': item.id,
+                    'title': item.title,
+                    'start': start_time.isoformat(),
+                    'end': end_time.isoformat(),
+                    'color': item.color,
+                    'extendedProps': {
+                        'description': item.description,
+                        'category': item.category,
+                        'priority': item.priority,
+                        'recurrence': item.recurrence_pattern
+                    }
+                })
+        return jsonify(items)
+    
     items = []
     for item in schedule_items:
         # Handle recurring events
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app.models.models import Task
-from app.models.duration_estimator import suggest_task_duration, get_duration_estimator
+from app.models.duration_estimator import (
+    cached_estimate, estimate_etag, estimate_key, get_duration_estimator,
+    suggest_task_duration, suggest_task_durations
+)
+from app.models.scheduler import IntelligentScheduler, ScheduleChange
+from app.models.profiling import SchedulingProfile
+from app.jobs import get_job_queue, get_model_retrainer
 from app import db
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, DateTimeField, SelectField, IntegerField, DateField
@@ -9,6 +15,12 @@ from wtforms.validators import DataRequired, Length, Optional, NumberRange
 
 tasks = Blueprint('tasks', __name__)
 
+# Most tasks a single batch estimate request may contain
+MAX_ESTIMATE_BATCH = 5000
+
+# Seconds browsers may reuse an estimate before revalidating it
+ESTIMATE_MAX_AGE = 60
+
 class TaskForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired(), Length(max=100)])
     description = TextAreaField('Description', validators=[Optional(), Length(max=500)])
@@ -59,6 +71,10 @@ def new_task():
         )
         db.session.add(task)
         db.session.commit()
+        
+        # Fit the new task into the existing plan
+        get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.TASK_ADDED, task_id=task.id))
+        
         flash('Task added successfully!', 'success')
         return redirect(url_for('tasks.index'))
     return render_template('tasks/new.html', form=form)
@@ -75,6 +91,8 @@ def edit_task(id):
     
     form = TaskForm(obj=task)
     if form.validate_on_submit():
+        previous_plan_inputs = (task.estimated_duration, task.priority, task.deadline)
+        
         task.title = form.title.data
         task.description = form.description.data
         task.deadline = form.deadline.data
@@ -88,6 +106,11 @@ def edit_task(id):
         task.category = form.category.data
         
         db.session.commit()
+        
+        # Re-place the task if anything the scheduler uses has changed
+        if (task.estimated_duration, task.priority, task.deadline) != previous_plan_inputs:
+            get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.TASK_UPDATED, task_id=task.id))
+        
         flash('Task updated successfully!', 'success')
         return redirect(url_for('tasks.index'))
     
@@ -103,6 +126,9 @@ def delete_task(id):
         flash('You do not have permission to delete this task.', 'danger')
         return redirect(url_for('tasks.index'))
     
+    # Release the task's blocks before the task goes away
+    get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.TASK_DELETED, task_id=task.id))
+    
     db.session.delete(task)
     db.session.commit()
     flash('Task deleted successfully!', 'success')
@@ -126,8 +152,16 @@ def update_status(id):
             # For now, we'll just mark it as completed
             pass
             
+        previous_status = task.status
         task.status = status
         db.session.commit()
+        
+        # Free the time of completed tasks and re-place tasks put back to pending
+        if status == 'completed' and previous_status != 'completed':
+            get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.TASK_COMPLETED, task_id=task.id))
+        elif status == 'pending' and previous_status != 'pending':
+            get_job_queue().repair(current_user.id, ScheduleChange(ScheduleChange.TASK_UPDATED, task_id=task.id))
+        
         flash('Task status updated successfully!', 'success')
     else:
         flash('Invalid status.', 'danger')
@@ -149,9 +183,8 @@ def update_actual_duration(id):
         task.actual_duration = int(actual_duration)
         db.session.commit()
         
-        # Update the duration estimation model with this feedback
-        estimator = get_duration_estimator(current_user.id)
-        estimator.update_model_with_feedback(current_user.id)
+        # Update the duration estimation model with this feedback in the background
+        get_model_retrainer().request_retrain(current_user.id, task)
         
         flash('Task duration feedback recorded. Thank you!', 'success')
     else:
@@ -162,38 +195,118 @@ def update_actual_duration(id):
 @tasks.route('/generate_schedule')
 @login_required
 def generate_schedule():
-    """Generate a schedule for pending tasks"""
-    from app.models.scheduler import schedule_tasks_for_user
+    """Generate a schedule for pending tasks in the background"""
+    get_job_queue().submit(current_user.id)
+    flash('Your schedule is being generated. It will show up in a moment.', 'info')
+    return redirect(url_for('tasks.index'))
+
+@tasks.route('/api/schedule_jobs', methods=['POST'])
+@login_required
+def api_submit_schedule_job():
+    """API endpoint to start generating the schedule in the background"""
+    job = get_job_queue().submit(current_user.id)
+    response = job.to_dict()
+    response['status_url'] = url_for('tasks.api_schedule_job', job_id=job.id)
+    return jsonify(response), 202
+
+@tasks.route('/api/schedule_jobs/<job_id>')
+@login_required
+def api_schedule_job(job_id):
+    """API endpoint to poll a schedule generation job"""
+    job = get_job_queue().get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@tasks.route('/api/preview_schedule')
+@login_required
+def api_preview_schedule():
+    """
+    API endpoint to preview what regenerating the schedule would produce,
+    without saving it.
     
-    # Clear any existing scheduled blocks
-    from app.models.models import ScheduledBlock
-    ScheduledBlock.query.filter_by(user_id=current_user.id).delete()
-    db.session.commit()
+    With ?debug=1 the response includes how long each scheduling phase
+    took; ?debug=allocations also measures the memory each phase allocated.
+    """
+    debug = request.args.get('debug')
+    profile = None
+    if debug:
+        profile = SchedulingProfile(trace_allocations=(debug == 'allocations'))
     
-    # Generate new schedule
-    scheduled_blocks = schedule_tasks_for_user(current_user.id)
+    scheduler = IntelligentScheduler(current_user.id, profile=profile)
+    tasks = scheduler.get_tasks_to_plan(replace_existing=True)
+    placements = scheduler.plan(tasks)
     
-    if scheduled_blocks:
-        flash(f'Successfully scheduled {len(scheduled_blocks)} tasks!', 'success')
-    else:
-        flash('No tasks were scheduled. Add some pending tasks first.', 'info')
+    titles = {task.id: task.title for task in tasks}
+    placed_ids = {placement.task_id for placement in placements}
     
-    return redirect(url_for('tasks.index'))
+    response = {
+        'start_date': scheduler.start_date.isoformat(),
+        'end_date': scheduler.end_date.isoformat(),
+        'placements': [
+            {
+                'task_id': placement.task_id,
+                'title': titles[placement.task_id],
+                'start': placement.start_time.isoformat(),
+                'end': placement.end_time.isoformat()
+            }
+            for placement in placements
+        ],
+        'unscheduled_task_ids': [task.id for task in tasks if task.id not in placed_ids]
+    }
+    if profile is not None:
+        profile.log(current_app.logger, user_id=current_user.id, endpoint='preview_schedule')
+        response['profile'] = profile.to_dict()
+    return jsonify(response)
 
-@tasks.route('/api/estimate_duration', methods=['POST'])
+@tasks.route('/api/estimate_duration', methods=['GET', 'POST'])
 @login_required
 def api_estimate_duration():
-    """API endpoint to estimate task duration"""
-    data = request.get_json()
+    """
+    API endpoint to estimate task duration.
+    
+    GET takes the task as query parameters and answers with an ETag, so
+    browsers can revalidate a repeated estimate and get a bodiless 304.
+    """
+    data = request.get_json() if request.method == 'POST' else request.args
     title = data.get('title', '')
     description = data.get('description', '')
     category = data.get('category', '')
     
-    estimated_duration = suggest_task_duration(
-        title, 
-        description, 
-        category,
+    estimator = get_duration_estimator(current_user.id)
+    key = estimate_key(estimator, title, description, category)
+    etag = estimate_etag(key)
+    if request.method == 'GET' and etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify({'estimated_duration': cached_estimate(estimator, key)})
+    
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = ESTIMATE_MAX_AGE
+    return response
+
+@tasks.route('/api/estimate_durations', methods=['POST'])
+@login_required
+def api_estimate_durations():
+    """
+    API endpoint to estimate the durations of many tasks at once.
+    
+    Takes a JSON list of {title, description, category} objects and
+    returns the estimates in the same order.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        return jsonify({'error': 'Expected a list of tasks'}), 400
+    if len(data) > MAX_ESTIMATE_BATCH:
+        return jsonify({'error': f'At most {MAX_ESTIMATE_BATCH} tasks can be estimated at once'}), 400
+    
+    estimated_durations = suggest_task_durations(
+        [
+            (item.get('title') or '', item.get('description') or '', item.get('category') or '')
+            for item in data
+        ],
         user_id=current_user.id
     )
     
-    return jsonify({'estimated_duration': estimated_duration})
+    return jsonify({'estimated_durations': estimated_durations})
@@ -9,50 +9,151 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Task duration estimation
     const estimateDurationBtn = document.getElementById('estimateDurationBtn');
-    if (estimateDurationBtn) {
-        estimateDurationBtn.addEventListener('click', function() {
-            const titleInput = document.getElementById('title');
-            const descriptionInput = document.getElementById('description');
-            const categoryInput = document.getElementById('category');
-            const durationInput = document.getElementById('estimated_duration');
-            
-            if (!titleInput.value.trim()) {
-                alert('Please enter a task title first.');
+    const durationInput = document.getElementById('estimated_duration');
+    const titleInput = document.getElementById('title');
+    if (durationInput && titleInput) {
+        const descriptionInput = document.getElementById('description');
+        const categoryInput = document.getElementById('category');
+        const defaultPlaceholder = durationInput.placeholder;
+        let estimateController = null;
+        let lastEstimateQuery = null;
+        let liveEstimateTimer = null;
+        
+        // GET so the browser cache and ETag revalidation answer repeated estimates
+        const fetchEstimate = (query) => {
+            if (estimateController) {
+                estimateController.abort();
+            }
+            estimateController = new AbortController();
+            return fetch('/tasks/api/estimate_duration?' + query, {signal: estimateController.signal})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Estimate failed with status ' + response.status);
+                }
+                return response.json();
+            })
+            .then(data => data.estimated_duration);
+        };
+        
+        const estimateQuery = () => new URLSearchParams({
+            title: titleInput.value.trim(),
+            description: descriptionInput ? descriptionInput.value.trim() : '',
+            category: categoryInput ? categoryInput.value.trim() : ''
+        }).toString();
+        
+        // While the user types, show the estimate as a hint once they pause
+        const updateLiveEstimate = () => {
+            const query = estimateQuery();
+            if (!titleInput.value.trim() || query === lastEstimateQuery) {
+                return;
+            }
+            lastEstimateQuery = query;
+            fetchEstimate(query)
+            .then(minutes => {
+                durationInput.placeholder = 'Suggested: ' + minutes + ' minutes';
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    durationInput.placeholder = defaultPlaceholder;
+                    lastEstimateQuery = null;
+                }
+            });
+        };
+        
+        [titleInput, descriptionInput, categoryInput].forEach(input => {
+            if (input) {
+                input.addEventListener('input', () => {
+                    clearTimeout(liveEstimateTimer);
+                    liveEstimateTimer = setTimeout(updateLiveEstimate, 400);
+                });
+            }
+        });
+        
+        if (estimateDurationBtn) {
+            estimateDurationBtn.addEventListener('click', function() {
+                if (!titleInput.value.trim()) {
+                    alert('Please enter a task title first.');
+                    return;
+                }
+                
+                // Show loading state
+                clearTimeout(liveEstimateTimer);
+                estimateDurationBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Estimating...';
+                estimateDurationBtn.disabled = true;
+                
+                const resetButton = () => {
+                    estimateDurationBtn.innerHTML = '<i class="fas fa-magic"></i> Suggest';
+                    estimateDurationBtn.disabled = false;
+                };
+                
+                // Make API call to get duration estimate
+                lastEstimateQuery = estimateQuery();
+                fetchEstimate(lastEstimateQuery)
+                .then(minutes => {
+                    durationInput.value = minutes;
+                    resetButton();
+                })
+                .catch((error) => {
+                    if (error.name === 'AbortError') {
+                        return;
+                    }
+                    console.error('Error:', error);
+                    alert('Failed to get duration estimate. Please try again or enter manually.');
+                    lastEstimateQuery = null;
+                    resetButton();
+                });
+            });
+        }
+    }
+
+    // Background schedule generation
+    document.querySelectorAll('[data-schedule-job-url]').forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            if (link.classList.contains('disabled')) {
                 return;
             }
             
             // Show loading state
-            estimateDurationBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Estimating...';
-            estimateDurationBtn.disabled = true;
+            const originalHtml = link.innerHTML;
+            link.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Generating...';
+            link.classList.add('disabled');
             
-            // Make API call to get duration estimate
-            fetch('/tasks/api/estimate_duration', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    title: titleInput.value.trim(),
-                    description: descriptionInput.value.trim(),
-                    category: categoryInput.value.trim()
-                }),
-            })
+            const resetLink = () => {
+                link.innerHTML = originalHtml;
+                link.classList.remove('disabled');
+            };
+            
+            // Poll the job until it is done, then show the new schedule
+            const poll = (statusUrl) => {
+                fetch(statusUrl)
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'finished') {
+                        window.location.reload();
+                    } else if (job.status === 'failed') {
+                        resetLink();
+                        alert('Failed to generate the schedule. Please try again.');
+                    } else {
+                        setTimeout(() => poll(statusUrl), 1000);
+                    }
+                })
+                .catch((error) => {
+                    console.error('Error:', error);
+                    resetLink();
+                });
+            };
+            
+            fetch(link.dataset.scheduleJobUrl, { method: 'POST' })
             .then(response => response.json())
-            .then(data => {
-                durationInput.value = data.estimated_duration;
-                // Reset button
-                estimateDurationBtn.innerHTML = '<i class="fas fa-magic"></i> Suggest';
-                estimateDurationBtn.disabled = false;
-            })
+            .then(job => poll(job.status_url))
             .catch((error) => {
                 console.error('Error:', error);
-                alert('Failed to get duration estimate. Please try again or enter manually.');
-                // Reset button
-                estimateDurationBtn.innerHTML = '<i class="fas fa-magic"></i> Suggest';
-                estimateDurationBtn.disabled = false;
+                // Fall back to the plain link
+                window.location.href = link.href;
             });
         });
-    }
+    });
 
     // Task status update confirmation
     const statusForms = document.querySelectorAll('form[id^="statusForm"]');
@@ -0,0 +1,289 @@
+"""
+Benchmark suite for the intelligent scheduler.
+
+Generates synthetic users with a realistic fixed schedule (recurring work,
+classes and gym sessions plus one-off appointments) and 10 to 10,000
+pending tasks, then times each phase of scheduling separately across
+several horizon lengths:
+
+    expand       IntelligentScheduler.get_fixed_schedule_items
+    free_blocks  IntelligentScheduler.get_free_time_blocks
+    assignment   greedy placement of the tasks into the free blocks
+
+Tasks are scored against the free blocks while they are placed, so the
+assignment phase includes the scoring cost.
+
+Everything runs on preloaded data, so no database is needed. Results are
+written as JSON and compared against a stored baseline:
+
+    python benchmarks/scheduler_benchmark.py --output bench.json
+    python benchmarks/scheduler_benchmark.py --save-baseline
+
+The script exits with status 1 when a phase got slower than the baseline
+by more than the tolerance.
+"""
+import argparse
+import copy
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.scheduler import IntelligentScheduler
+from app.models.scheduling_core import TaskSpec, plan_schedule
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+TASK_COUNTS = (10, 100, 1000, 10000)
+HORIZONS = (7, 30, 90)
+PHASES = ('expand', 'free_blocks', 'assignment')
+
+# Monday the benchmark schedules start on, so the runs are reproducible
+START_DATE = datetime.date(2025, 1, 6)
+
+def generate_fixed_items(rng, start_date):
+    """
+    Generate a fixed schedule: a working week, evening classes, gym
+    sessions, a monthly meeting and some one-off appointments.
+
+    Returns:
+        List of objects with the attributes of FixedScheduleItem
+    """
+    items = []
+
+    def add(title, day_offset, start, end, pattern):
+        day = start_date + datetime.timedelta(days=day_offset)
+        items.append(SimpleNamespace(
+            id=len(items) + 1,
+            title=title,
+            start_time=datetime.datetime.combine(day, start),
+            end_time=datetime.datetime.combine(day, end),
+            recurrence_pattern=pattern,
+            recurrence_end_date=None
+        ))
+
+    # Work, Monday to Friday, with the odd late start
+    for weekday in range(5):
+        start_hour = rng.choice([8, 9, 9, 9, 10])
+        add('Work', weekday, datetime.time(start_hour), datetime.time(start_hour + 8), 'weekly')
+
+    # Evening classes on two weekdays
+    for weekday in rng.sample(range(5), 2):
+        add('Class', weekday, datetime.time(18, 30), datetime.time(20, 0), 'weekly')
+
+    # Gym three times a week, plus a daily walk
+    for weekday in (0, 2, 5):
+        add('Gym', weekday, datetime.time(7, 0), datetime.time(8, 30), 'weekly')
+    add('Walk', 0, datetime.time(21, 0), datetime.time(21, 30), 'daily')
+
+    add('Team review', rng.randrange(28), datetime.time(15, 0), datetime.time(16, 0), 'monthly')
+
+    # One-off appointments over the next few months
+    for _ in range(20):
+        hour = rng.randint(8, 20)
+        add('Appointment', rng.randrange(90), datetime.time(hour), datetime.time(hour, 45), 'none')
+
+    return items
+
+def generate_tasks(rng, task_count, now, horizon_days):
+    """
+    Generate pending tasks with a spread of durations, priorities and deadlines.
+
+    About a third of the tasks have no deadline and a few are overdue.
+
+    Returns:
+        List of TaskSpec objects
+    """
+    tasks = []
+    for task_id in range(1, task_count + 1):
+        deadline = None
+        if rng.random() > 0.3:
+            deadline = now + datetime.timedelta(hours=rng.randint(-24, horizon_days * 36))
+        tasks.append(TaskSpec(
+            task_id,
+            rng.choice([15, 15, 30, 30, 30, 45, 60, 60, 90, 120, 180]),
+            rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 2, 1])[0],
+            deadline
+        ))
+    return tasks
+
+def _timed(function):
+    """Wall time in seconds of one call with the garbage collector paused, and its result."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        result = function()
+        return time.perf_counter() - started, result
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _best_time(function, repeat, setup=None):
+    """
+    Best wall time in seconds of a number of calls, and the last result.
+
+    If given, setup is called before every run and its result is passed to
+    the function, untimed.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is None:
+            elapsed, result = _timed(function)
+        else:
+            argument = setup()
+            elapsed, result = _timed(lambda: function(argument))
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def benchmark_case(task_count, horizon_days, repeat=5, seed=0):
+    """
+    Time every scheduling phase for one synthetic user.
+
+    Returns:
+        Dict with the case parameters, the timings of each phase in
+        seconds and the sizes of the intermediate results
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.combine(START_DATE, datetime.time(7, 0))
+    scheduler = IntelligentScheduler(
+        1, START_DATE, START_DATE + datetime.timedelta(days=horizon_days - 1),
+        preferences=None,
+        fixed_items=generate_fixed_items(rng, START_DATE),
+        dependencies=[]
+    )
+    tasks = generate_tasks(rng, task_count, now, horizon_days)
+
+    timings = {}
+    timings['expand'], occurrences = _best_time(scheduler.get_fixed_schedule_items, repeat)
+    timings['free_blocks'], free_blocks = _best_time(scheduler.get_free_time_blocks, repeat)
+    # Placement consumes the blocks, so every run gets a fresh copy
+    timings['assignment'], placements = _best_time(
+        lambda blocks: plan_schedule(tasks, blocks, scheduler.preferences, now),
+        repeat,
+        setup=lambda: copy.deepcopy(free_blocks)
+    )
+
+    return {
+        'tasks': task_count,
+        'days': horizon_days,
+        'timings': timings,
+        'counts': {
+            'occurrences': len(occurrences),
+            'free_blocks': len(free_blocks),
+            'placements': len(placements)
+        }
+    }
+
+def run_benchmarks(task_counts=TASK_COUNTS, horizons=HORIZONS, repeat=5):
+    """
+    Run every combination of task count and horizon.
+
+    Returns:
+        Dict ready to be written as JSON
+    """
+    import numpy as np
+
+    cases = []
+    for horizon_days in horizons:
+        for task_count in task_counts:
+            cases.append(benchmark_case(task_count, horizon_days, repeat))
+    return {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'repeat': repeat
+        },
+        'cases': cases
+    }
+
+def compare_results(results, baseline, tolerance=0.5, min_seconds=0.005):
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        results: Output of run_benchmarks
+        baseline: Previously saved output of run_benchmarks
+        tolerance: Allowed slowdown as a fraction of the baseline time
+        min_seconds: Phases faster than this in both runs are ignored as noise
+
+    Returns:
+        List of (task count, days, phase, baseline seconds, current seconds)
+        for every phase that regressed
+    """
+    baseline_cases = {(case['tasks'], case['days']): case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        baseline_case = baseline_cases.get((case['tasks'], case['days']))
+        if baseline_case is None:
+            continue
+        for phase, seconds in case['timings'].items():
+            baseline_seconds = baseline_case['timings'].get(phase)
+            if baseline_seconds is None or max(seconds, baseline_seconds) < min_seconds:
+                continue
+            if seconds > baseline_seconds * (1 + tolerance):
+                regressions.append((case['tasks'], case['days'], phase, baseline_seconds, seconds))
+    return regressions
+
+def _print_table(results):
+    print(f"{'days':>5} {'tasks':>6} " + ' '.join(f'{phase:>12}' for phase in PHASES) + '   (ms)')
+    for case in results['cases']:
+        print(f"{case['days']:>5} {case['tasks']:>6} " + ' '.join(
+            f"{case['timings'][phase] * 1000:>12.2f}" for phase in PHASES
+        ))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the intelligent scheduler.')
+    parser.add_argument('--tasks', type=int, nargs='+', default=list(TASK_COUNTS),
+                        help='Task counts to benchmark')
+    parser.add_argument('--days', type=int, nargs='+', default=list(HORIZONS),
+                        help='Horizon lengths in days to benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per phase; the best time is kept')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed slowdown against the baseline, as a fraction')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baseline instead of comparing')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.tasks, args.days, args.repeat)
+    _print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline to create one')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_results(results, baseline, args.tolerance)
+    for task_count, days, phase, baseline_seconds, seconds in regressions:
+        print(f'REGRESSION {phase} ({task_count} tasks, {days} days): '
+              f'{baseline_seconds * 1000:.2f}ms -> {seconds * 1000:.2f}ms')
+    if regressions:
+        return 1
+    print('No regressions against the baseline')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Startup benchmark for the Flask app.
+
+Starts a fresh interpreter several times, times create_app() and a few
+requests to pages that need no duration model, and reports which of the
+heavy ML libraries ended up imported:
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --path / --path /auth/login
+
+The script exits with status 1 when serving those pages imported
+scikit-learn or SciPy, which only the learned duration model needs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pages that never estimate durations
+DEFAULT_PATHS = ('/', '/auth/login', '/auth/register')
+
+# Libraries only the learned duration model needs
+ML_MODULES = ('sklearn', 'scipy')
+
+# Run in the fresh interpreter; prints one JSON line
+_CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+statuses = [client.get(path).status_code for path in sys.argv[1:]]
+served = time.perf_counter()
+print(json.dumps({
+    'create_app': created - started,
+    'requests': served - created,
+    'statuses': statuses,
+    'ml_modules': [name for name in %r if name in sys.modules]
+}))
+""" % (ML_MODULES,)
+
+def measure_startup(paths=DEFAULT_PATHS, env=None):
+    """
+    Start the app in a fresh interpreter and request some pages.
+
+    The app runs against an in-memory database without ML preloading,
+    unless env says otherwise.
+
+    Returns:
+        Dict with the create_app and request times in seconds, the
+        response status codes and the ML libraries that got imported
+    """
+    child_env = dict(os.environ, DATABASE_URL='sqlite://', PRELOAD_ML='0')
+    child_env.update(env or {})
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD_SCRIPT, *paths],
+        cwd=ROOT, env=child_env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_benchmark(paths=DEFAULT_PATHS, repeat=5):
+    """
+    Measure startup several times.
+
+    Returns:
+        Dict ready to be written as JSON, with the best times and the ML
+        libraries imported in any run
+    """
+    runs = [measure_startup(paths) for _ in range(repeat)]
+    return {
+        'paths': list(paths),
+        'create_app': min(run['create_app'] for run in runs),
+        'requests': min(run['requests'] for run in runs),
+        'statuses': runs[-1]['statuses'],
+        'ml_modules': sorted({name for run in runs for name in run['ml_modules']})
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the app startup.')
+    parser.add_argument('--path', dest='paths', action='append',
+                        help='Page to request after startup (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh starts; the best time is kept')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.paths or DEFAULT_PATHS, args.repeat)
+    print(f"create_app {results['create_app'] * 1000:.1f}ms, "
+          f"{len(results['paths'])} requests {results['requests'] * 1000:.1f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if results['ml_modules']:
+        print('Imported ML libraries: ' + ', '.join(results['ml_modules']))
+        return 1
+    print('No ML libraries imported')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,24 @@
 import unittest
 from app import create_app, db
-from app.models.models import User, FixedScheduleItem, Task, ScheduledBlock
+from app.models.models import User, FixedScheduleItem, Task, TaskDependency, ScheduledBlock
 from app.models.duration_estimator import TaskDurationEstimator
-from app.models.scheduler import IntelligentScheduler
-from datetime import datetime, timedelta
+from app.models.scheduler import IntelligentScheduler, ScheduleChange
+from app.models.recurrence import iter_occurrences
+from app.models.schedule_cache import bump_schedule_version
+from app.models.scheduling_core import FreeBlock, FreeBlockPool, _task_base_score, to_epoch_minutes
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
 import os
+import shutil
 import tempfile
 
+# Completed tasks the duration model tests learn from: (title, category, actual minutes)
+DURATION_HISTORY = [
+    ('Write report', 'Work', 90), ('Reply to emails', 'Email', 20),
+    ('Gym session', 'Exercise', 60), ('Plan sprint', 'Planning', 45),
+    ('Review pull request', 'Review', 30), ('Research topic', 'Research', 120)
+]
+
 class CalendarAppTestCase(unittest.TestCase):
     def setUp(self):
         """Set up test environment"""
@@ -14,6 +26,7 @@ class CalendarAppTestCase(unittest.TestCase):
         self.app.config['TESTING'] = True
         self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['DURATION_MODEL_DIR'] = tempfile.mkdtemp()
         self.client = self.app.test_client()
         
         with self.app.app_context():
@@ -32,6 +45,7 @@ class CalendarAppTestCase(unittest.TestCase):
         with self.app.app_context():
             db.session.remove()
             db.drop_all()
+        shutil.rmtree(self.app.config['DURATION_MODEL_DIR'], ignore_errors=True)
     
     def login(self):
         """Helper function to log in"""
@@ -40,6 +54,21 @@ class CalendarAppTestCase(unittest.TestCase):
             'password': 'password123'
         }, follow_redirects=True)
     
+    def history_tasks(self):
+        """Helper returning DURATION_HISTORY as completed task stand-ins"""
+        return [
+            SimpleNamespace(title=title, description='', category=category, actual_duration=duration)
+            for title, category, duration in DURATION_HISTORY
+        ]
+    
+    def add_history_tasks(self):
+        """Helper adding DURATION_HISTORY to the test user as completed tasks"""
+        with self.app.app_context():
+            for title, category, duration in DURATION_HISTORY:
+                db.session.add(Task(user_id=self.user_id, title=title, category=category, estimated_duration=60,
+                                    actual_duration=duration, status='completed'))
+            db.session.commit()
+    
     def test_home_page(self):
         """Test that home page loads correctly"""
         response = self.client.get('/')
@@ -120,6 +149,110 @@ class CalendarAppTestCase(unittest.TestCase):
             explicit_duration = estimator.predict_duration("30 minute meeting", "Team standup", "Meeting")
             self.assertEqual(explicit_duration, 30)
     
+    def test_feature_extraction_first_match(self):
+        """Test that the precompiled feature tables keep first-listed-wins matching"""
+        estimator = TaskDurationEstimator()
+        
+        # 'work' is listed before 'review', wherever they appear
+        features = estimator.extract_features("Code review", "", "Review of work")
+        self.assertEqual(features['category_features']['category_multiplier'], 1.2)
+        self.assertEqual(features['word_count'], 5)
+        
+        # 'quick' wins over 'comprehensive' even though it appears later
+        self.assertEqual(estimator.predict_duration("Comprehensive audit", "a quick one", ""), 30)
+        
+        # Minutes and hours are added up
+        self.assertEqual(estimator.predict_duration("Workshop", "2 hours plus 15min setup and 1hr wrap-up", ""), 195)
+
+    def test_batch_duration_estimation(self):
+        """Test that batch estimates match one-at-a-time estimates"""
+        self.login()
+        tasks = [
+            {'title': 'Quick email reply', 'description': 'Send a brief response', 'category': 'Email'},
+            {'title': 'Research project', 'description': 'Comprehensive research', 'category': 'Study'},
+            {'title': '30 minute meeting', 'category': 'Meeting'},
+            {'title': 'Untitled'}
+        ]
+        
+        response = self.client.post('/tasks/api/estimate_durations', json=tasks)
+        
+        self.assertEqual(response.status_code, 200)
+        expected = [
+            self.client.post('/tasks/api/estimate_duration', json=task).json['estimated_duration']
+            for task in tasks
+        ]
+        self.assertEqual(response.json['estimated_durations'], expected)
+        self.assertEqual(self.client.post('/tasks/api/estimate_durations', json={'title': 'Report'}).status_code, 400)
+
+    def test_sparse_duration_features(self):
+        """Test that the learned model is trained and queried on sparse features"""
+        from scipy import sparse
+        
+        history = DURATION_HISTORY
+        estimator = TaskDurationEstimator()
+        self.assertTrue(estimator.train_model(self.history_tasks()))
+        
+        features = [estimator.extract_features(title, '', category) for title, category, _ in history]
+        X = estimator._feature_matrix(features)
+        self.assertTrue(sparse.issparse(X))
+        self.assertEqual(X.shape, (len(history), len(estimator.vectorizer.vocabulary_) + 2))
+        self.assertEqual(X[0, -2], features[0]['word_count'])
+        self.assertEqual(estimator.predict_durations((title, '', category) for title, category, _ in history),
+                         [duration for _, _, duration in history])
+
+    def test_estimate_cache(self):
+        """Test that repeated estimates are memoized, coalesced and revalidated with ETags"""
+        import threading
+        import time
+        from app.models.duration_estimator import EstimateCache
+        
+        cache = EstimateCache(max_entries=2, ttl=60)
+        self.assertEqual(cache.get_or_compute('a', lambda: 30), 30)
+        self.assertEqual(cache.get_or_compute('a', lambda: 45), 30)
+        cache.get_or_compute('b', lambda: 45)
+        cache.get_or_compute('c', lambda: 60)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_compute('a', lambda: 90), 90)
+        self.assertEqual(EstimateCache(ttl=0).get_or_compute('a', lambda: 30), 30)
+        
+        # Identical requests arriving during a computation share it
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+        
+        def slow_estimate():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 75
+        
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('slow', slow_estimate)))
+                   for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        for _ in range(500):
+            if cache.coalesced == 3:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((len(calls), results), (1, [75] * 4))
+        
+        self.login()
+        url = '/tasks/api/estimate_duration?title=Quick+email+reply&category=Email'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.headers.get('ETag'))
+        self.assertEqual(response.json['estimated_duration'], self.client.post(
+            '/tasks/api/estimate_duration', json={'title': 'quick  EMAIL reply', 'category': 'Email'}
+        ).json['estimated_duration'])
+        
+        revalidated = self.client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+
     def test_intelligent_scheduling(self):
         """Test intelligent scheduling algorithm"""
         with self.app.app_context():
@@ -199,5 +332,657 @@ class CalendarAppTestCase(unittest.TestCase):
                 if block.start_time.hour == lunch_start.hour:
                     self.assertFalse(lunch_start.hour <= block.start_time.hour < lunch_end.hour)
 
+    def test_free_time_blocks_merge_overlaps(self):
+        """Test that overlapping fixed items are merged into one busy period"""
+        with self.app.app_context():
+            day = datetime(2025, 4, 7)
+            db.session.add_all([
+                FixedScheduleItem(user_id=self.user_id, title='Meeting',
+                                  start_time=day.replace(hour=9), end_time=day.replace(hour=12)),
+                FixedScheduleItem(user_id=self.user_id, title='Workshop',
+                                  start_time=day.replace(hour=11), end_time=day.replace(hour=13)),
+                FixedScheduleItem(user_id=self.user_id, title='Call',
+                                  start_time=day.replace(hour=12, minute=30), end_time=day.replace(hour=12, minute=45)),
+            ])
+            db.session.commit()
+            
+            scheduler = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=day.date())
+            blocks = scheduler.get_free_time_blocks()
+            
+            self.assertEqual(
+                [(b.start_time, b.end_time) for b in blocks],
+                [(day.replace(hour=8), day.replace(hour=9)),
+                 (day.replace(hour=13), day.replace(hour=22))]
+            )
+            self.assertEqual(blocks[1].duration_minutes, 540)
+
+    def test_recurrence_expansion(self):
+        """Test that recurring items expand to the right occurrences"""
+        with self.app.app_context():
+            # Weekly on Wednesdays, starting the first occurrence inside the window
+            gym = FixedScheduleItem(user_id=self.user_id, title='Gym',
+                                    start_time=datetime(2025, 1, 1, 18, 0),
+                                    end_time=datetime(2025, 1, 1, 19, 30),
+                                    recurrence_pattern='weekly')
+            occurrences = list(iter_occurrences(gym, date(2025, 4, 7), date(2025, 4, 20)))
+            self.assertEqual(occurrences, [
+                (datetime(2025, 4, 9, 18, 0), datetime(2025, 4, 9, 19, 30)),
+                (datetime(2025, 4, 16, 18, 0), datetime(2025, 4, 16, 19, 30)),
+            ])
+            
+            # Monthly on the 31st falls back to the last day of shorter months
+            rent = FixedScheduleItem(user_id=self.user_id, title='Rent',
+                                     start_time=datetime(2025, 1, 31, 23, 0),
+                                     end_time=datetime(2025, 1, 31, 1, 0),
+                                     recurrence_pattern='monthly',
+                                     recurrence_end_date=date(2025, 4, 30))
+            occurrences = list(iter_occurrences(rent, date(2025, 2, 1), date(2025, 12, 31)))
+            self.assertEqual([start.date() for start, _ in occurrences],
+                             [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+            self.assertEqual(occurrences[0][1], datetime(2025, 3, 1, 1, 0))
+
+    def test_score_matrix_matches_scalar_scores(self):
+        """Test that the vectorized score matrix and the block pool match calculate_task_score"""
+        with self.app.app_context():
+            now = datetime(2025, 4, 7, 8, 0)
+            tasks = [
+                Task(title='Overdue', estimated_duration=30, priority=5, deadline=now - timedelta(hours=1)),
+                Task(title='Soon', estimated_duration=90, priority=3, deadline=now + timedelta(hours=30)),
+                Task(title='Someday', estimated_duration=45, priority=1),
+            ]
+            blocks = [
+                FreeBlock(to_epoch_minutes(now.replace(hour=hour)), to_epoch_minutes(now.replace(hour=hour)) + minutes)
+                for hour, minutes in [(8, 60), (10, 120), (14, 45), (18, 30), (21, 240)]
+            ]
+            
+            scheduler = IntelligentScheduler(self.user_id)
+            matrix = scheduler.calculate_score_matrix(tasks, blocks, now)
+            
+            self.assertEqual(matrix.shape, (3, 5))
+            for i, task in enumerate(tasks):
+                for j, block in enumerate(blocks):
+                    self.assertEqual(matrix[i, j], scheduler.calculate_task_score(task, block, now))
+            
+            # Placement picks the best block of each row
+            pool = FreeBlockPool(blocks, 15)
+            for i, task in enumerate(tasks):
+                score, position = pool.best_fit(task.estimated_duration, _task_base_score(task, now))
+                self.assertEqual(score, matrix[i].max())
+                self.assertEqual(position, matrix[i].argmax())
+
+    def test_incremental_reschedule(self):
+        """Test that a change only re-places the blocks it affects"""
+        with self.app.app_context():
+            day = datetime(2030, 1, 7)
+            report = Task(user_id=self.user_id, title='Report', estimated_duration=60, priority=5, status='pending')
+            emails = Task(user_id=self.user_id, title='Emails', estimated_duration=30, priority=3, status='pending')
+            db.session.add_all([report, emails])
+            db.session.commit()
+            
+            scheduler = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=day.date())
+            scheduler.generate_schedule()
+            emails_block = ScheduledBlock.query.filter_by(task_id=emails.id).one()
+            self.assertEqual(emails_block.start_time, day.replace(hour=9))
+            
+            # A new fixed item only clashes with the report's block
+            standup = FixedScheduleItem(user_id=self.user_id, title='Standup',
+                                        start_time=day.replace(hour=8, minute=30),
+                                        end_time=day.replace(hour=8, minute=45))
+            db.session.add(standup)
+            bump_schedule_version(self.user_id)
+            db.session.commit()
+            scheduler.reschedule(ScheduleChange(ScheduleChange.ITEM_ADDED, item_id=standup.id))
+            
+            self.assertEqual(ScheduledBlock.query.filter_by(task_id=emails.id).one().id, emails_block.id)
+            report_block = ScheduledBlock.query.filter_by(task_id=report.id).one()
+            self.assertEqual(report_block.start_time, day.replace(hour=9, minute=30))
+            
+            # A new task goes into the gap left before the standup
+            call = Task(user_id=self.user_id, title='Call', estimated_duration=20, priority=3, status='pending')
+            db.session.add(call)
+            db.session.commit()
+            new_blocks = scheduler.reschedule(ScheduleChange(ScheduleChange.TASK_ADDED, task_id=call.id))
+            
+            self.assertEqual(len(new_blocks), 1)
+            self.assertEqual(new_blocks[0].start_time, day.replace(hour=8))
+            self.assertEqual(ScheduledBlock.query.filter_by(user_id=self.user_id).count(), 3)
+            self.assertEqual(db.session.get(Task, call.id).status, 'scheduled')
+
+    def test_reschedule_moves_dependents(self):
+        """Test that a repair moves the tasks depending on a task it re-places"""
+        with self.app.app_context():
+            day = datetime(2030, 1, 7)
+            draft = Task(user_id=self.user_id, title='Draft', estimated_duration=60, priority=3, status='pending')
+            review = Task(user_id=self.user_id, title='Review', estimated_duration=60, priority=3, status='pending')
+            publish = Task(user_id=self.user_id, title='Publish', estimated_duration=30, priority=3, status='pending')
+            db.session.add_all([draft, review, publish])
+            db.session.flush()
+            db.session.add_all([TaskDependency(task_id=draft.id, dependent_task_id=review.id),
+                                TaskDependency(task_id=review.id, dependent_task_id=publish.id)])
+            db.session.commit()
+            
+            scheduler = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=day.date())
+            scheduler.generate_schedule()
+            
+            # The draft grows and no longer fits before the review
+            draft.estimated_duration = 300
+            db.session.commit()
+            scheduler.reschedule(ScheduleChange(ScheduleChange.TASK_UPDATED, task_id=draft.id))
+            
+            blocks = {block.task_id: block for block in ScheduledBlock.query.filter_by(user_id=self.user_id)}
+            self.assertEqual(blocks[draft.id].end_time - blocks[draft.id].start_time, timedelta(minutes=300))
+            self.assertGreaterEqual(blocks[review.id].start_time, blocks[draft.id].end_time)
+            self.assertGreaterEqual(blocks[publish.id].start_time, blocks[review.id].end_time)
+
+    def test_schedule_all_command(self):
+        """Test the batch scheduling CLI command"""
+        with self.app.app_context():
+            db.session.add(Task(user_id=self.user_id, title='Report', estimated_duration=60,
+                                priority=4, status='pending'))
+            db.session.commit()
+        
+        result = self.app.test_cli_runner().invoke(args=['schedule-all', '--workers', '0'])
+        
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Scheduled 1 blocks for 1 users', result.output)
+        self.assertIn('p50=', result.output)
+        with self.app.app_context():
+            self.assertEqual(ScheduledBlock.query.filter_by(user_id=self.user_id).count(), 1)
+
+    def test_schedule_all_waits_for_prerequisites(self):
+        """Test that the batch command waits for prerequisites that aren't re-planned"""
+        with self.app.app_context():
+            draft = Task(user_id=self.user_id, title='Draft', estimated_duration=60, priority=3, status='in_progress')
+            review = Task(user_id=self.user_id, title='Review', estimated_duration=30, priority=5, status='pending')
+            db.session.add_all([draft, review])
+            db.session.flush()
+            draft_end = datetime.combine(date.today() + timedelta(days=2), datetime.min.time()).replace(hour=12)
+            db.session.add_all([
+                TaskDependency(task_id=draft.id, dependent_task_id=review.id),
+                ScheduledBlock(user_id=self.user_id, task_id=draft.id, start_time=draft_end - timedelta(hours=1),
+                               end_time=draft_end, status='confirmed')
+            ])
+            db.session.commit()
+            review_id = review.id
+        
+        result = self.app.test_cli_runner().invoke(args=['schedule-all', '--workers', '0'])
+        
+        self.assertEqual(result.exit_code, 0, result.output)
+        with self.app.app_context():
+            self.assertGreaterEqual(ScheduledBlock.query.filter_by(task_id=review_id).one().start_time, draft_end)
+
+    def test_preview_schedule(self):
+        """Test that the preview endpoint plans tasks without saving anything"""
+        self.login()
+        with self.app.app_context():
+            db.session.add(Task(user_id=self.user_id, title='Report', estimated_duration=60,
+                                priority=4, status='pending'))
+            db.session.commit()
+        
+        response = self.client.get('/tasks/api/preview_schedule')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['placements']), 1)
+        self.assertEqual(response.json['placements'][0]['title'], 'Report')
+        self.assertEqual(response.json['unscheduled_task_ids'], [])
+        with self.app.app_context():
+            self.assertEqual(ScheduledBlock.query.count(), 0)
+            self.assertEqual(Task.query.one().status, 'pending')
+
+    def test_preview_matches_regenerate(self):
+        """Test that the preview plans what regenerating an existing plan does"""
+        from app.models.scheduler import replace_schedule_for_user
+        
+        self.login()
+        with self.app.app_context():
+            db.session.add_all([
+                Task(user_id=self.user_id, title=f'Task {i}', estimated_duration=30 * (i + 1),
+                     priority=i + 2, status='pending')
+                for i in range(3)
+            ])
+            db.session.commit()
+            IntelligentScheduler(self.user_id).generate_schedule(replace_existing=True)
+        
+        preview = self.client.get('/tasks/api/preview_schedule').json
+        with self.app.app_context():
+            regenerated = replace_schedule_for_user(self.user_id)
+        
+        self.assertEqual(len(preview['placements']), 3)
+        self.assertEqual(preview['unscheduled_task_ids'], [])
+        self.assertEqual(
+            [(placement['task_id'], placement['start']) for placement in preview['placements']],
+            [(placement.task_id, placement.start_time.isoformat()) for placement in regenerated]
+        )
+
+    def test_bitmap_availability(self):
+        """Test that the bitmap engine agrees with the interval sweep"""
+        with self.app.app_context():
+            day = datetime(2025, 4, 7)
+            db.session.add_all([
+                FixedScheduleItem(user_id=self.user_id, title='Work',
+                                  start_time=day.replace(hour=9), end_time=day.replace(hour=17),
+                                  recurrence_pattern='daily'),
+                FixedScheduleItem(user_id=self.user_id, title='Lunch',
+                                  start_time=day.replace(hour=12), end_time=day.replace(hour=13),
+                                  recurrence_pattern='daily'),
+                FixedScheduleItem(user_id=self.user_id, title='Sleep',
+                                  start_time=day.replace(hour=21, minute=30), end_time=day.replace(hour=7),
+                                  recurrence_pattern='weekly'),
+            ])
+            db.session.commit()
+            
+            end = (day + timedelta(days=13)).date()
+            intervals = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=end)
+            bitmap = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=end,
+                                          free_time_engine='bitmap')
+            self.assertEqual(
+                [(b.start, b.end) for b in bitmap.get_free_time_blocks()],
+                [(b.start, b.end) for b in intervals.get_free_time_blocks()]
+            )
+            
+            availability = bitmap.get_availability()
+            evening = to_epoch_minutes(day.replace(hour=17))
+            self.assertTrue(availability.fits(evening, 60))
+            self.assertFalse(availability.fits(evening - 30, 60))
+            availability.occupy(evening, evening + 30)
+            self.assertFalse(availability.fits(evening, 60))
+            self.assertTrue(availability.fits(evening + 30, 60))
+            
+            # Starts between slot boundaries at a coarser resolution
+            coarse = bitmap.get_availability(resolution=5)
+            self.assertTrue(coarse.fits(evening + 2, 30))
+            self.assertTrue(coarse.fits(evening + 2, 5))
+            self.assertFalse(coarse.fits(evening - 2, 30))
+
+    def test_dependency_aware_scheduling(self):
+        """Test that tasks are scheduled after their prerequisites and cycles are skipped"""
+        with self.app.app_context():
+            def add_task(title, priority, duration):
+                task = Task(user_id=self.user_id, title=title, estimated_duration=duration,
+                            priority=priority, status='pending')
+                db.session.add(task)
+                return task
+            
+            research = add_task('Research', 1, 120)
+            write_up = add_task('Write up', 5, 60)
+            review = add_task('Review', 3, 30)
+            first = add_task('Chicken', 4, 30)
+            second = add_task('Egg', 4, 30)
+            db.session.flush()
+            db.session.add_all([
+                TaskDependency(task_id=research.id, dependent_task_id=write_up.id),
+                TaskDependency(task_id=write_up.id, dependent_task_id=review.id),
+                TaskDependency(task_id=first.id, dependent_task_id=second.id),
+                TaskDependency(task_id=second.id, dependent_task_id=first.id)
+            ])
+            db.session.commit()
+            
+            scheduler = IntelligentScheduler(self.user_id)
+            blocks = {block.task_id: block for block in scheduler.generate_schedule()}
+            
+            self.assertEqual(set(blocks), {research.id, write_up.id, review.id})
+            self.assertGreaterEqual(blocks[write_up.id].start_time, blocks[research.id].end_time)
+            self.assertGreaterEqual(blocks[review.id].start_time, blocks[write_up.id].end_time)
+            self.assertEqual(Task.query.get(first.id).status, 'pending')
+
+    def test_scheduler_benchmark(self):
+        """Test that the scheduler benchmark runs and flags slowdowns against a baseline"""
+        from benchmarks.scheduler_benchmark import run_benchmarks, compare_results
+        
+        results = run_benchmarks(task_counts=[10], horizons=[7], repeat=1)
+        case = results['cases'][0]
+        self.assertEqual(set(case['timings']), {'expand', 'free_blocks', 'assignment'})
+        self.assertGreater(case['counts']['free_blocks'], 0)
+        self.assertEqual(case['counts']['placements'], 10)
+        
+        self.assertEqual(compare_results(results, results), [])
+        faster = {'cases': [dict(case, timings={phase: seconds / 10
+                                                for phase, seconds in case['timings'].items()})]}
+        self.assertEqual(len(compare_results(results, faster, min_seconds=0)), 3)
+
+    def test_startup_skips_ml_stack(self):
+        """Test that starting the app and serving non-ML pages never imports scikit-learn"""
+        from benchmarks.startup_benchmark import measure_startup
+        
+        result = measure_startup()
+        
+        self.assertEqual(result['statuses'][0], 200)
+        self.assertEqual(result['ml_modules'], [])
+        self.assertGreater(result['create_app'], 0)
+
+    def test_schedule_job_queue(self):
+        """Test that schedule generation runs as a background job and coalesces per user"""
+        import threading
+        from app.jobs import ScheduleJobQueue
+        
+        self.login()
+        with self.app.app_context():
+            db.session.add(Task(user_id=self.user_id, title='Report', estimated_duration=60,
+                                priority=4, status='pending'))
+            db.session.commit()
+        
+        response = self.client.post('/tasks/api/schedule_jobs')
+        self.assertEqual(response.status_code, 202)
+        job = self.app.extensions['schedule_jobs'].wait(response.json['job_id'], timeout=10)
+        self.assertEqual(job.status, 'finished')
+        self.assertEqual(job.scheduled_count, 1)
+        
+        status = self.client.get(response.json['status_url'])
+        self.assertEqual(status.json['status'], 'finished')
+        self.assertEqual(self.client.get('/tasks/api/schedule_jobs/unknown').status_code, 404)
+        with self.app.app_context():
+            self.assertEqual(ScheduledBlock.query.filter_by(user_id=self.user_id).count(), 1)
+        
+        # Requests made while a job is waiting for a worker join that job
+        queue = ScheduleJobQueue(self.app, max_workers=1)
+        gate = threading.Event()
+        queue._executor.submit(gate.wait)
+        first = queue.submit(self.user_id)
+        self.assertIs(queue.submit(self.user_id), first)
+        gate.set()
+        self.assertEqual(queue.wait(first.id, timeout=10).status, 'finished')
+        
+        # Repairs wait while the user's blocks are being replaced
+        def repair():
+            with self.app.app_context():
+                queue.repair(self.user_id, ScheduleChange(ScheduleChange.TASK_ADDED, task_id=task_id))
+        with self.app.app_context():
+            task = Task(user_id=self.user_id, title='Call', estimated_duration=15, priority=3, status='pending')
+            db.session.add(task)
+            db.session.commit()
+            task_id = task.id
+        with queue.user_lock(self.user_id):
+            repairer = threading.Thread(target=repair)
+            repairer.start()
+            repairer.join(timeout=0.2)
+            self.assertTrue(repairer.is_alive())
+        repairer.join(timeout=10)
+        self.assertFalse(repairer.is_alive())
+        with self.app.app_context():
+            self.assertEqual(ScheduledBlock.query.filter_by(task_id=task_id).count(), 1)
+
+    def test_bulk_plan_persistence(self):
+        """Test that regenerating replaces the plan in bulk without duplicating blocks"""
+        with self.app.app_context():
+            db.session.add_all([
+                Task(user_id=self.user_id, title=f'Task {i}', estimated_duration=30,
+                     priority=3, status='pending')
+                for i in range(20)
+            ])
+            db.session.commit()
+            
+            scheduler = IntelligentScheduler(self.user_id)
+            self.assertEqual(len(scheduler.generate_schedule(replace_existing=True)), 20)
+            self.assertEqual(len(scheduler.generate_schedule(replace_existing=True)), 20)
+            
+            self.assertEqual(ScheduledBlock.query.filter_by(user_id=self.user_id).count(), 20)
+            self.assertEqual(Task.query.filter_by(user_id=self.user_id, status='scheduled').count(), 20)
+            self.assertEqual(ScheduledBlock.query.filter_by(status='suggested').count(), 20)
+            
+            # A scheduled task that no longer fits anywhere goes back to pending
+            task = Task.query.filter_by(user_id=self.user_id).first()
+            task.estimated_duration = 5000
+            db.session.commit()
+            self.assertEqual(len(scheduler.generate_schedule(replace_existing=True)), 19)
+            self.assertEqual(db.session.get(Task, task.id).status, 'pending')
+            self.assertEqual(Task.query.filter_by(user_id=self.user_id, status='scheduled').count(), 19)
+
+    def test_scheduling_profile(self):
+        """Test that the preview endpoint can report a per-phase breakdown"""
+        self.login()
+        with self.app.app_context():
+            db.session.add(Task(user_id=self.user_id, title='Report', estimated_duration=60,
+                                priority=4, status='pending'))
+            db.session.commit()
+        
+        profile = self.client.get('/tasks/api/preview_schedule?debug=allocations').json['profile']
+        phases = {phase['phase']: phase for phase in profile['phases']}
+        self.assertTrue({'load_tasks', 'expand', 'free_blocks', 'assignment'} <= set(phases))
+        self.assertEqual(phases['assignment']['count'], 1)
+        self.assertIsNotNone(phases['free_blocks']['peak_bytes'])
+        self.assertGreaterEqual(profile['total_ms'], phases['assignment']['ms'])
+        
+        self.assertNotIn('profile', self.client.get('/tasks/api/preview_schedule').json)
+
+    def test_free_busy_cache(self):
+        """Test that repeated runs reuse the expanded schedule until it is edited"""
+        from app.models.profiling import SchedulingProfile
+        from app.models.schedule_cache import FreeBusyCache
+        
+        self.login()
+        with self.app.app_context():
+            day = datetime(2030, 1, 7)
+            work = FixedScheduleItem(user_id=self.user_id, title='Work', start_time=day.replace(hour=9),
+                                     end_time=day.replace(hour=17), recurrence_pattern='daily')
+            db.session.add(work)
+            db.session.commit()
+            work_id = work.id
+            
+            def free_blocks():
+                profile = SchedulingProfile()
+                scheduler = IntelligentScheduler(self.user_id, start_date=day.date(), end_date=day.date(),
+                                                 profile=profile)
+                blocks = [(block.start_time.hour, block.end_time.hour) for block in scheduler.get_free_time_blocks()]
+                return blocks, [phase.name for phase in profile.phases]
+            
+            blocks, phases = free_blocks()
+            self.assertEqual(blocks, [(8, 9), (17, 22)])
+            self.assertIn('expand', phases)
+            blocks, phases = free_blocks()
+            self.assertEqual(blocks, [(8, 9), (17, 22)])
+            self.assertEqual(phases, ['free_busy_cache'])
+        
+        # An edit made by another process reaches this one through the database
+        with self.app.app_context():
+            FixedScheduleItem.query.get(work_id).end_time = day.replace(hour=12)
+            bump_schedule_version(self.user_id)
+            db.session.commit()
+            self.assertEqual(free_blocks()[0], [(8, 9), (12, 22)])
+        
+        self.client.post(f'/schedule/delete/{work_id}')
+        with self.app.app_context():
+            self.assertEqual(free_blocks()[0], [(8, 22)])
+        
+        # Entries expire even if the version never changes
+        cache = FreeBusyCache(ttl=0)
+        cache.put((self.user_id, 0, 'busy'), [(0, 1)])
+        self.assertIsNone(cache.get((self.user_id, 0, 'busy')))
+        
+        # The cache stays within its memory budget
+        cache = FreeBusyCache(max_bytes=2000)
+        for user_id in range(10):
+            cache.put((user_id, 0, 'busy'), [(i, i + 1) for i in range(10)])
+        self.assertLessEqual(cache.bytes, 2000)
+        self.assertLess(len(cache), 10)
+        self.assertIsNotNone(cache.get((9, 0, 'busy')))
+        self.assertIsNone(cache.get((0, 0, 'busy')))
+
+    def test_estimator_cache(self):
+        """Test that trained models are loaded once and reloaded when the file changes"""
+        from app.models.duration_estimator import EstimatorCache
+        
+        history = self.history_tasks()
+        model_dir = self.app.config['DURATION_MODEL_DIR']
+        model_path = os.path.join(model_dir, 'duration_model.npz')
+        estimator = TaskDurationEstimator()
+        self.assertTrue(estimator.train_model(history))
+        estimator.save_model(model_path)
+        
+        cache = EstimatorCache()
+        self.assertIsNone(cache.get(os.path.join(model_dir, 'missing.npz')))
+        loaded = cache.get(model_path)
+        self.assertIsNotNone(loaded.model)
+        self.assertIs(cache.get(model_path), loaded)
+        
+        # A retrained model on disk replaces the cached one
+        os.utime(model_path, ns=(0, 0))
+        self.assertIsNot(cache.get(model_path), loaded)
+        self.assertEqual(len(cache), 1)
+        
+        # Models larger than the budget are served but not kept
+        self.assertIsNotNone(EstimatorCache(max_bytes=1).get(model_path).model)
+        small = EstimatorCache(max_bytes=1)
+        small.get(model_path)
+        self.assertEqual(len(small), 0)
+
+    def test_background_model_retraining(self):
+        """Test that bursts of feedback are debounced into one background retrain"""
+        from unittest import mock
+        from app.jobs import ModelRetrainer
+        from app.models.duration_estimator import get_duration_estimator
+        from app.models.models import DurationAdjustment
+        
+        self.add_history_tasks()
+        
+        retrainer = ModelRetrainer(self.app, delay=0.1)
+        with mock.patch.object(TaskDurationEstimator, 'update_global_model', autospec=True,
+                               side_effect=TaskDurationEstimator.update_global_model) as update:
+            for _ in range(5):
+                retrainer.request_retrain(self.user_id)
+            self.assertTrue(retrainer.wait_idle(timeout=30))
+            
+            # In online mode a retrain without new observations leaves the model alone
+            online_retrainer = ModelRetrainer(self.app, delay=0.1, online=True)
+            online_retrainer.request_retrain(self.user_id)
+            self.assertTrue(online_retrainer.wait_idle(timeout=30))
+        
+        self.assertEqual(update.call_count, 1)
+        with self.app.app_context():
+            self.assertIsNotNone(get_duration_estimator(self.user_id).model)
+            self.assertEqual(DurationAdjustment.query.filter_by(user_id=self.user_id).one().sample_count, 6)
+
+    def test_duration_adjustment(self):
+        """Test that each user's estimates are corrected on top of the shared model"""
+        from app.models.duration_estimator import (
+            fit_duration_adjustment, get_duration_estimator, update_duration_adjustment
+        )
+        
+        self.assertEqual(fit_duration_adjustment([], []), (1.0, 0.0))
+        # One task only nudges the estimates, a consistent pattern takes over
+        scale, bias = fit_duration_adjustment([60], [120])
+        self.assertLess(60 * scale + bias, 80)
+        scale, bias = fit_duration_adjustment([30, 60, 90, 120] * 25, [60, 120, 180, 240] * 25)
+        for estimate in (30, 60, 120):
+            self.assertAlmostEqual(estimate * scale + bias, 2 * estimate, delta=10)
+        
+        with self.app.app_context():
+            # A user who always takes twice the rule-based estimate
+            shared = get_duration_estimator()
+            for i in range(40):
+                title = f'Chore {i}'
+                estimate = shared.predict_duration(title, '', 'Cleaning')
+                db.session.add(Task(user_id=self.user_id, title=title, category='Cleaning',
+                                    actual_duration=estimate * 2, status='completed'))
+            db.session.add(Task(user_id=self.user_id, title='Call', description='15 minutes',
+                                actual_duration=90, status='completed'))
+            db.session.commit()
+            
+            self.assertEqual(update_duration_adjustment(self.user_id).sample_count, 40)
+            estimator = get_duration_estimator(self.user_id)
+            self.assertIs(estimator.model, shared.model)
+            self.assertAlmostEqual(estimator.predict_duration('Chore', '', 'Cleaning'),
+                                   2 * shared.predict_duration('Chore', '', 'Cleaning'), delta=10)
+            # Explicit durations are taken as stated
+            self.assertEqual(estimator.predict_duration('Call', '15 minutes', ''), 15)
+            self.assertEqual(shared.predict_duration('Chore', '', 'Cleaning'),
+                             get_duration_estimator().predict_duration('Chore', '', 'Cleaning'))
+
+    def test_stale_duration_adjustment(self):
+        """Test that adjustments fitted against an older shared model are ignored, then refitted"""
+        from unittest import mock
+        from app.jobs import ModelRetrainer
+        from app.models.duration_estimator import (
+            get_duration_estimator, stale_duration_adjustments, update_duration_adjustment
+        )
+        from app.models.models import DurationAdjustment
+        
+        self.add_history_tasks()
+        with self.app.app_context():
+            other = User(username='other', email='other@example.com')
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+            
+            # Fitted against the rule-based estimates, before any model exists
+            adjustment = update_duration_adjustment(self.user_id)
+            self.assertEqual(adjustment.model_version, 'rules')
+            adjustment.scale, adjustment.bias = 2.0, 10.0
+            db.session.commit()
+            self.assertEqual(get_duration_estimator(self.user_id).scale, 2.0)
+            
+            # The other user's feedback changes the shared model
+            db.session.add(Task(user_id=other_id, title='Write report', category='Work',
+                                actual_duration=100, status='completed'))
+            db.session.commit()
+        
+        retrainer = ModelRetrainer(self.app, delay=0.05)
+        with mock.patch.object(ModelRetrainer, '_schedule', autospec=True,
+                               side_effect=ModelRetrainer._schedule) as schedule:
+            retrainer.request_retrain(other_id)
+            self.assertTrue(retrainer.wait_idle(timeout=30))
+        # One batched refit rather than a timer per stale user
+        self.assertEqual([call.args[1] for call in schedule.call_args_list],
+                         [ModelRetrainer.GLOBAL, other_id, ModelRetrainer.STALE])
+        with self.app.app_context():
+            
+            current = get_duration_estimator().model_fingerprint
+            self.assertNotEqual(current, 'rules')
+            refitted = DurationAdjustment.query.filter_by(user_id=self.user_id).one()
+            self.assertEqual(refitted.model_version, current)
+            self.assertNotEqual((refitted.scale, refitted.bias), (2.0, 10.0))
+            self.assertEqual(stale_duration_adjustments(), [])
+            
+            # Until it is refitted, a stale adjustment is not applied at all
+            refitted.model_version = 'rules'
+            db.session.commit()
+            self.assertEqual(stale_duration_adjustments(), [self.user_id])
+            estimator = get_duration_estimator(self.user_id)
+            self.assertEqual((estimator.scale, estimator.bias), (1.0, 0.0))
+
+    def test_model_storage_round_trip(self):
+        """Test that batch and incremental models survive being saved as arrays"""
+        history = self.history_tasks()
+        queries = [('Write the report', '', 'Work'), ('Emails', 'inbox zero', 'Email'), ('Something new', '', '')]
+        model_path = os.path.join(self.app.config['DURATION_MODEL_DIR'], 'model.npz')
+        
+        batch = TaskDurationEstimator()
+        self.assertTrue(batch.train_model(history))
+        self.assertTrue(batch.save_model(model_path))
+        loaded = TaskDurationEstimator(model_path=model_path)
+        self.assertEqual(loaded.predict_durations(queries), batch.predict_durations(queries))
+        
+        online = TaskDurationEstimator()
+        online.learn_online(history)
+        self.assertTrue(online.save_model(model_path))
+        loaded = TaskDurationEstimator(model_path=model_path)
+        self.assertEqual(loaded.predict_durations(queries), online.predict_durations(queries))
+        
+        # The loaded model keeps learning exactly where the saved one stopped
+        online.learn_online(history)
+        loaded.learn_online(history)
+        self.assertEqual(loaded.model.regressor.coef_.tolist(), online.model.regressor.coef_.tolist())
+
+    def test_online_duration_learning(self):
+        """Test that the incremental model learns from single observations in constant space"""
+        import pickle
+        
+        history = DURATION_HISTORY
+        estimator = TaskDurationEstimator()
+        sizes = []
+        for i in range(300):
+            title, category, duration = history[i % len(history)]
+            estimator.learn_online([SimpleNamespace(title=title, description='', category=category,
+                                                    actual_duration=duration)])
+            if i in (50, 299):
+                sizes.append(len(pickle.dumps(estimator.model)))
+        
+        # Only counters grow, never the learned state
+        self.assertAlmostEqual(sizes[0], sizes[1], delta=16)
+        for title, category, duration in history:
+            predicted = estimator.predict_duration(title, '', category)
+            self.assertEqual(predicted % 5, 0)
+            self.assertGreaterEqual(predicted, 15)
+            self.assertLessEqual(abs(predicted - duration), 10)
+
 if __name__ == '__main__':
     unittest.main()